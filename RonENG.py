@@ -1,13 +1,744 @@
 import time
 import os
+import sys
 import random
-from datetime import datetime
+import asyncio
+import copy
+import csv
+import concurrent.futures
+import itertools
+import hashlib
+import heapq
+import tracemalloc
+import gzip
+import json
+import queue
+import threading
+from functools import wraps
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # Без NumPy бій розраховується чистим Python
+    np = None
+
+# Довідник спорядження за замовчуванням
+EQUIPMENT_DATABASE = {
+    "Гвинтівка": {"вага": 4.5, "ефективність": 7},
+    "Пістолет": {"вага": 1.0, "ефективність": 4},
+    "Аптечка": {"вага": 2.0, "ефективність": 8},
+    "Рація": {"вага": 1.5, "ефективність": 6},
+    "Бінокль": {"вага": 1.0, "ефективність": 5},
+    "Патрони": {"вага": 0.5, "ефективність": 6},
+    "Граната": {"вага": 0.7, "ефективність": 8},
+    "Рація": {"вага": 1.0, "ефективність": 3},
+    "Вода": {"вага": 1.5, "ефективність": 4},
+    "Нічний приціл": {"вага": 1.2, "ефективність": 7}
+}
+
+
+class StatusIndex:
+    """Індекс солдатів за статусом для миттєвих вибірок без перебору"""
+    
+    def __init__(self, statuses=(), on_change=None):
+        # Словник використовується як впорядкована множина
+        self.groups = {status: {} for status in statuses}
+        self.on_change = on_change  # виклик при зміні складу або показників солдатів
+    
+    def add(self, soldier):
+        self.groups.setdefault(soldier.status, {})[soldier] = None
+        self.touch()
+    
+    def discard(self, soldier):
+        self.groups.get(soldier.status, {}).pop(soldier, None)
+        self.touch()
+    
+    def touch(self):
+        if self.on_change:
+            self.on_change()
+    
+    def move(self, soldier, old_status, new_status):
+        if old_status == new_status:
+            return
+        group = self.groups.get(old_status, {})
+        if soldier not in group:
+            # Солдат не індексований цим індексом
+            return
+        del group[soldier]
+        self.groups.setdefault(new_status, {})[soldier] = None
+        self.touch()
+    
+    def get(self, status):
+        return list(self.groups.get(status, ()))
+    
+    def count(self, status):
+        return len(self.groups.get(status, ()))
+    
+    def counts(self):
+        return {status: len(group) for status, group in self.groups.items() if group}
+
+
+class MessageStore:
+    """Спільне сховище повідомлень: кожне повідомлення зберігається один раз,
+    а отримувачі посилаються на нього за порядковим номером"""
+    
+    shared = None
+    
+    def __init__(self, max_messages=10000, max_age=None):
+        self.max_messages = max_messages
+        self.max_age = max_age  # максимальний вік повідомлення в секундах
+        self.entries = []  # (номер, час, відправник, повідомлення, отримувач)
+        self.offset = 0  # індекс першого актуального запису
+        self.base_seq = 0  # номер запису entries[0]
+        self.next_seq = 0
+        self.sender_index = {}
+        self.inboxes = {}
+        self.cursors = {}
+    
+    @classmethod
+    def default(cls):
+        """Сховище за замовчуванням для об'єктів, створених поза симулятором"""
+        if cls.shared is None:
+            cls.shared = cls()
+        return cls.shared
+    
+    def post(self, sender, message, recipients=(), to=None):
+        seq = self.next_seq
+        self.next_seq += 1
+        entry = (seq, datetime.now(), sender, message, to)
+        self.entries.append(entry)
+        self.sender_index.setdefault(sender, []).append(seq)
+        for recipient in recipients:
+            self.inboxes.setdefault(recipient, []).append(seq)
+        self._prune()
+        return entry
+    
+    def get(self, seq):
+        index = seq - self.base_seq
+        if self.offset <= index < len(self.entries):
+            return self.entries[index]
+        return None
+    
+    def first_seq(self):
+        return self.base_seq + self.offset
+    
+    def inbox(self, recipient):
+        """Усі збережені повідомлення отримувача"""
+        return self._resolve(self.inboxes.get(recipient))
+    
+    def unread(self, recipient, mark_read=True):
+        """Повідомлення після курсора читання отримувача"""
+        seqs = self.inboxes.get(recipient)
+        if not seqs:
+            return []
+        cursor = self.cursors.get(recipient, -1)
+        start = bisect_right(seqs, cursor)
+        messages = self._resolve(seqs, start)
+        if mark_read and messages:
+            self.cursors[recipient] = messages[-1][0]
+        return messages
+    
+    def unread_count(self, recipient):
+        seqs = self.inboxes.get(recipient)
+        if not seqs:
+            return 0
+        self._trim(seqs)
+        return len(seqs) - bisect_right(seqs, self.cursors.get(recipient, -1))
+    
+    def by_sender(self, sender):
+        return self._resolve(self.sender_index.get(sender))
+    
+    def in_range(self, start=None, end=None):
+        """Повідомлення з часом у межах [start, end]"""
+        lo = self.offset
+        hi = len(self.entries)
+        if start is not None:
+            lo = bisect_left(self.entries, start, lo, hi, key=lambda entry: entry[1])
+        if end is not None:
+            hi = bisect_right(self.entries, end, lo, hi, key=lambda entry: entry[1])
+        return self.entries[lo:hi]
+    
+    def forget(self, recipient):
+        self.inboxes.pop(recipient, None)
+        self.cursors.pop(recipient, None)
+    
+    def _resolve(self, seqs, start=0):
+        if not seqs:
+            return []
+        start = max(0, start - self._trim(seqs))
+        return [self.entries[seq - self.base_seq] for seq in seqs[start:]]
+    
+    def _trim(self, seqs):
+        """Видалити з початку списку номери вже видалених повідомлень"""
+        dropped = bisect_left(seqs, self.first_seq())
+        if dropped:
+            del seqs[:dropped]
+        return dropped
+    
+    def _prune(self):
+        live = len(self.entries) - self.offset
+        if live > self.max_messages:
+            self.offset += live - self.max_messages
+        
+        if self.max_age is not None:
+            cutoff = datetime.now() - timedelta(seconds=self.max_age)
+            self.offset = bisect_left(self.entries, cutoff, self.offset, len(self.entries), key=lambda entry: entry[1])
+        
+        # Ущільнення списку, коли більша його частина вже неактуальна
+        if self.offset > 64 and self.offset * 2 > len(self.entries):
+            del self.entries[:self.offset]
+            self.base_seq += self.offset
+            self.offset = 0
+            for index in (self.sender_index, self.inboxes):
+                for key in list(index):
+                    seqs = index[key]
+                    self._trim(seqs)
+                    if not seqs:
+                        del index[key]
+
+
+class LogEntry(tuple):
+    """Закодований запис журналу: (секунда запису, номер шаблону, *аргументи); текст формується під час виведення"""
+    
+    __slots__ = ()
+    
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self[0])
+    
+    @property
+    def template_id(self):
+        return self[1]
+    
+    @property
+    def args(self):
+        return self[2:]
+    
+    @property
+    def template(self):
+        return EVENT_TEMPLATES.templates[self[1]]
+    
+    def __str__(self):
+        return EVENT_TEMPLATES.render(self)
+
+
+class EventTemplates:
+    """Реєстр шаблонів записів журналу та інтернованих аргументів"""
+    
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+    
+    def __init__(self):
+        self.templates = []
+        self.ids = {}
+        self.base_ids = []  # номер шаблону -> номер шаблону без префікса сутності
+        self._second = None
+    
+    def register(self, template, base_id=None):
+        template_id = self.ids.get(template)
+        if template_id is None:
+            template_id = len(self.templates)
+            self.templates.append(template)
+            self.ids[template] = template_id
+            self.base_ids.append(template_id if base_id is None else base_id)
+        return template_id
+    
+    def _intern(self, value):
+        # Рядки інтернуються, змінювані об'єкти фіксуються текстом на момент запису
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, tuple):
+            interned = tuple(self._intern(item) for item in value)
+            return value if all(new is old for new, old in zip(interned, value)) else interned
+        if isinstance(value, self.IMMUTABLE_TYPES):
+            return value
+        return sys.intern(str(value))
+    
+    def encode(self, template, args=(), prefix="", prefix_args=(), timestamp=None):
+        if not args:
+            # Текст без аргументів може бути довільним: він стає інтернованим аргументом єдиного шаблону
+            template, args = "{}", (template,)
+        template_id = base_id = self.register("{}: " + template)
+        if prefix:
+            # Префікс сутності (звання, ім'я) вбудовується в шаблон, а не повторюється в кожному записі
+            prefix = prefix.format(*prefix_args).replace("{", "{{").replace("}", "}}")
+            template_id = self.register("{}: " + prefix + template, base_id)
+        
+        # Час зберігається з точністю виведення; записи однієї секунди ділять один об'єкт числа
+        second = int((timestamp or datetime.now()).timestamp())
+        if second == self._second:
+            second = self._second
+        else:
+            self._second = second
+        return LogEntry((second, template_id) + self._intern(tuple(args)))
+    
+    def render(self, entry):
+        return self.templates[entry[1]].format(datetime.fromtimestamp(entry[0]).strftime(self.TIME_FORMAT), *entry[2:])
+    
+    def counts(self, entries):
+        """Кількість записів за шаблонами"""
+        counts = {}
+        for entry in entries:
+            if isinstance(entry, LogEntry):
+                template = self.templates[self.base_ids[entry[1]]]
+                counts[template] = counts.get(template, 0) + 1
+        return counts
+
+
+EVENT_TEMPLATES = EventTemplates()
+
+
+class EventStore:
+    """Єдиний журнал подій усіх сутностей з індексами за сутністю, типом і часом"""
+    
+    shared = None
+    
+    def __init__(self):
+        # Стовпці за номером події: закодований запис, час, номер сутності, номер типу
+        self.entries = []
+        self.times = array("d")
+        self.entity_ids = array("I")
+        self.type_ids = array("H")
+        self.base_seq = 0  # номер події entries[0]
+        self.entities = []  # номер -> (вид сутності, назва сутності)
+        self.types = []
+        self._entity_numbers = {}
+        self._type_numbers = {}
+        self.entity_index = {}
+        self.type_index = {}
+        self.template_index = {}
+    
+    @classmethod
+    def default(cls):
+        """Журнал за замовчуванням для об'єктів, створених поза симулятором"""
+        if cls.shared is None:
+            cls.shared = cls()
+        return cls.shared
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    @staticmethod
+    def _number(value, numbers, values):
+        number = numbers.get(value)
+        if number is None:
+            number = numbers[value] = len(values)
+            values.append(value)
+        return number
+    
+    def record(self, entity_kind, entity_name, event_type, entry):
+        seq = self.base_seq + len(self.entries)
+        entity = (entity_kind, entity_name)
+        self.entries.append(entry)
+        self.times.append(entry[0])
+        self.entity_ids.append(self._number(entity, self._entity_numbers, self.entities))
+        self.type_ids.append(self._number(event_type, self._type_numbers, self.types))
+        self.entity_index.setdefault(entity, array("I")).append(seq)
+        self.type_index.setdefault(event_type, array("I")).append(seq)
+        self.template_index.setdefault(EVENT_TEMPLATES.base_ids[entry.template_id], array("I")).append(seq)
+        return seq
+    
+    def event(self, seq):
+        """(номер, час, вид сутності, назва сутності, тип, закодований запис)"""
+        index = seq - self.base_seq
+        entry = self.entries[index]
+        entity_kind, entity_name = self.entities[self.entity_ids[index]]
+        return (seq, entry.timestamp, entity_kind, entity_name, self.types[self.type_ids[index]], entry)
+    
+    def query(self, entity=None, event_type=None, start=None, end=None, limit=None):
+        """Події за сутністю (вид, назва), типом і проміжком часу без повного перебору"""
+        # Час записів має точність до секунди, тож початок проміжку округлюється вниз
+        lo = 0 if start is None else bisect_left(self.times, int(start.timestamp()))
+        hi = len(self.entries) if end is None else bisect_right(self.times, end.timestamp())
+        lo += self.base_seq
+        hi += self.base_seq
+        
+        candidates = []
+        entity_id = type_id = None
+        if entity is not None:
+            entity_id = self._entity_numbers.get(entity)
+            candidates.append(self.entity_index.get(entity, ()))
+        if event_type is not None:
+            type_id = self._type_numbers.get(event_type)
+            candidates.append(self.type_index.get(event_type, ()))
+        
+        if not candidates:
+            seqs = range(lo, hi)
+        else:
+            # Перебираємо найкоротший індекс у межах часового проміжку
+            candidates.sort(key=len)
+            shortest = candidates[0]
+            seqs = shortest[bisect_left(shortest, lo):bisect_left(shortest, hi)]
+        
+        results = []
+        for seq in reversed(seqs):
+            if entity is not None and self.entity_ids[seq - self.base_seq] != entity_id:
+                continue
+            if event_type is not None and self.type_ids[seq - self.base_seq] != type_id:
+                continue
+            results.append(self.event(seq))
+            if limit is not None and len(results) >= limit:
+                break
+        results.reverse()
+        return results
+    
+    def discard_before(self, cutoff):
+        """Видалити з пам'яті події, старші за межу (вже перенесені до архіву)"""
+        count = bisect_left(self.times, cutoff.timestamp())
+        if not count:
+            return 0
+        del self.entries[:count]
+        del self.times[:count]
+        del self.entity_ids[:count]
+        del self.type_ids[:count]
+        self.base_seq += count
+        for index in (self.entity_index, self.type_index, self.template_index):
+            for key in list(index):
+                seqs = index[key]
+                del seqs[:bisect_left(seqs, self.base_seq)]
+                if not seqs:
+                    del index[key]
+        return count
+    
+    def counts_by_type(self):
+        return {event_type: len(seqs) for event_type, seqs in self.type_index.items()}
+    
+    def counts_by_template(self):
+        return {EVENT_TEMPLATES.templates[template_id]: len(seqs) for template_id, seqs in self.template_index.items()}
+
+
+class MessageBus:
+    """Внутрішня шина повідомлень з темами та пріоритетними чергами"""
+    
+    PRIORITIES = ["Блискавичне", "Негайне", "Звичайне"]
+    THEATRE_TOPIC = "театр"
+    
+    def __init__(self, message_store=None, batch_size=500):
+        self.message_store = message_store or MessageStore.default()
+        self.batch_size = batch_size
+        self.lanes = {priority: deque() for priority in self.PRIORITIES}
+        self.subscribers = {}  # тема -> список підписників
+        self.resolvers = {}  # тема -> функція, що повертає поточних отримувачів
+        self.async_queues = {}  # тема -> список asyncio.Queue
+        self.delivered = 0
+    
+    @staticmethod
+    def team_topic(team_name):
+        return f"команда:{team_name}"
+    
+    @staticmethod
+    def mission_topic(mission_name):
+        return f"місія:{mission_name}"
+    
+    def register_topic(self, topic, resolver):
+        """Зареєструвати тему, отримувачі якої обчислюються під час доставки"""
+        self.resolvers[topic] = resolver
+    
+    def subscribe(self, topic, subscriber):
+        """Підписати солдата, команду або функцію зворотного виклику на тему"""
+        self.subscribers.setdefault(topic, []).append(subscriber)
+    
+    def unsubscribe(self, topic, subscriber):
+        if subscriber in self.subscribers.get(topic, ()):
+            self.subscribers[topic].remove(subscriber)
+            return True
+        return False
+    
+    def async_queue(self, topic, maxsize=0):
+        """Створити asyncio.Queue, до якої доставлятимуться повідомлення теми"""
+        queue = asyncio.Queue(maxsize)
+        self.async_queues.setdefault(topic, []).append(queue)
+        return queue
+    
+    def has_topic(self, topic):
+        """Чи має тема резолвер, підписників або асинхронні черги"""
+        return topic in self.resolvers or bool(self.subscribers.get(topic)) or bool(self.async_queues.get(topic))
+    
+    def publish(self, topic, message, sender="Штаб", priority="Звичайне", recipients=None, to=None, callback=None):
+        """Поставити повідомлення в чергу; recipients фіксує отримувачів замість отримувачів теми"""
+        if priority not in self.lanes or not self.has_topic(topic):
+            return False
+        self.lanes[priority].append((topic, sender, message, recipients, to, callback))
+        return True
+    
+    def pending(self):
+        return sum(len(lane) for lane in self.lanes.values())
+    
+    def dispatch(self, max_messages=None):
+        """Доставити пакет повідомлень, починаючи з найвищого пріоритету"""
+        budget = self.batch_size if max_messages is None else max_messages
+        recipients_cache = {}
+        delivered = 0
+        
+        for priority in self.PRIORITIES:
+            lane = self.lanes[priority]
+            while lane and delivered < budget:
+                topic, sender, message, explicit, to, on_delivery = lane.popleft()
+                if topic not in recipients_cache:
+                    recipients_cache[topic] = self._resolve_topic(topic)
+                recipients, callbacks = recipients_cache[topic]
+                
+                if explicit is None:
+                    entry = self.message_store.post(sender, message, recipients, to=topic)
+                else:
+                    entry = self.message_store.post(sender, message, explicit, to=to)
+                if on_delivery:
+                    on_delivery(entry)
+                for callback in callbacks:
+                    callback(entry)
+                for queue in self.async_queues.get(topic, ()):
+                    if not queue.full():
+                        queue.put_nowait(entry)
+                delivered += 1
+        
+        self.delivered += delivered
+        return delivered
+    
+    async def run(self, interval=0.05):
+        """Фонова доставка пакетів у циклі подій asyncio"""
+        while True:
+            if not self.dispatch():
+                await asyncio.sleep(interval)
+            else:
+                await asyncio.sleep(0)
+    
+    def _resolve_topic(self, topic):
+        recipients = []
+        callbacks = []
+        targets = list(self.subscribers.get(topic, ()))
+        if topic in self.resolvers:
+            targets.extend(self.resolvers[topic]())
+        
+        seen = set()
+        for target in targets:
+            if id(target) in seen:
+                continue
+            seen.add(id(target))
+            if callable(target):
+                callbacks.append(target)
+            else:
+                recipients.append(target)
+        return recipients, callbacks
+
+
+class RecordingRandom(random.Random):
+    """Генератор, що повідомляє реєстратор про кожне базове витягування"""
+    
+    def __init__(self, seed, key, recorder=None):
+        self.key = key
+        self.recorder = recorder
+        super().__init__(seed)
+    
+    def random(self):
+        if self.recorder:
+            self.recorder.record_draw(self.key, "random", None)
+        return super().random()
+    
+    def getrandbits(self, k):
+        if self.recorder:
+            self.recorder.record_draw(self.key, "getrandbits", k)
+        return super().getrandbits(k)
+
+
+class RandomStreams:
+    """Менеджер незалежних відтворюваних потоків випадкових чисел"""
+    
+    def __init__(self, seed=None, on_new_stream=None):
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 63)
+        self.streams = {}
+        self.on_new_stream = on_new_stream  # виклик (назва, зерно) при створенні потоку
+        self.recorder = None  # реєстратор витягувань для відтворення
+    
+    def derive_seed(self, *key):
+        """Детерміновано отримати зерно для ключа з головного зерна"""
+        material = repr((self.seed,) + key).encode("utf-8")
+        return int.from_bytes(hashlib.sha256(material).digest()[:8], "big")
+    
+    def stream(self, *key):
+        """Повернути окремий потік для підсистеми або місії, наприклад ("місія", назва)"""
+        if key not in self.streams:
+            seed = self.derive_seed(*key)
+            self.streams[key] = RecordingRandom(seed, key, self.recorder)
+            if self.on_new_stream:
+                self.on_new_stream(":".join(str(part) for part in key), seed)
+        return self.streams[key]
+    
+    def spawn(self, replica):
+        """Створити некорельований менеджер для паралельної репліки"""
+        return RandomStreams(self.derive_seed("репліка", replica))
+    
+    def reseed(self, seed):
+        self.seed = seed
+        self.streams = {}
+
+
+class ReplayRecorder:
+    """Запис структурованих змін стану симулятора для відтворення та перемотування.
+    
+    Сутності записуються змінами між тактами, підсистеми тактів - знімком на кінець кожного такту.
+    """
+    
+    def __init__(self, simulator, checkpoint_interval=50):
+        self.simulator = simulator
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_ticks = []
+        self.checkpoints = {}  # такт -> (повний стан, стани генераторів)
+        self.deltas = {}  # такт -> {ключ сутності: новий запис}
+        self.draws = {}  # такт -> [(ключ потоку, метод, аргумент)]
+        self.systems = {}  # такт -> знімок підсистем тактів на кінець такту
+        self.pending_draws = []
+        self.last_state = None
+        self.dirty = {}  # id(сутності) -> сутність, змінена з останнього такту
+        self.positions = {}  # id(сутності) -> (вид, позиція у списку симулятора)
+        self.capture(simulator.current_tick)
+    
+    def record_draw(self, key, method, arg):
+        self.pending_draws.append((key, method, arg))
+    
+    def mark_dirty(self, entity):
+        self.dirty[id(entity)] = entity
+    
+    def _reindex(self):
+        """Перебудувати позиції сутностей; нові та переставлені сутності стають зміненими"""
+        simulator = self.simulator
+        previous = self.positions
+        self.positions = {}
+        for kind, collection in (("soldier", simulator.soldiers), ("team", simulator.teams), ("mission", simulator.missions)):
+            for i, entity in enumerate(collection):
+                self.positions[id(entity)] = (kind, i)
+                # Записи команд і місій посилаються на позиції солдатів і команд
+                if kind != "soldier" or previous.get(id(entity)) != (kind, i):
+                    self.dirty[id(entity)] = entity
+    
+    def _dirty_records(self):
+        """Записи лише тих сутностей, що змінилися з останнього такту"""
+        simulator = self.simulator
+        if (len(self.positions) != len(simulator.soldiers) + len(simulator.teams) + len(simulator.missions)
+                or any(key not in self.positions for key in self.dirty)):
+            self._reindex()
+        
+        records = {}
+        soldier_ids = team_ids = None
+        for key, entity in self.dirty.items():
+            position = self.positions.get(key)
+            if position is None:
+                # Сутність уже вилучена зі списків симулятора
+                continue
+            kind, index = position
+            if kind == "soldier":
+                records[position] = simulator.soldier_record(entity)
+            elif kind == "team":
+                if soldier_ids is None:
+                    soldier_ids = {id(soldier): i for i, soldier in enumerate(simulator.soldiers)}
+                records[position] = simulator.team_record(entity, soldier_ids)
+            else:
+                if team_ids is None:
+                    team_ids = {id(team): i for i, team in enumerate(simulator.teams)}
+                records[position] = simulator.mission_record(entity, team_ids)
+        return records
+    
+    def capture(self, tick):
+        """Зберегти зміни, накопичені до кінця такту"""
+        if self.last_state is None:
+            self.last_state = {}
+            self._reindex()
+        changed = self._dirty_records()
+        self.dirty = {}
+        delta = {key: record for key, record in changed.items() if self.last_state.get(key) != record}
+        self.deltas[tick] = delta
+        self.draws[tick] = self.pending_draws
+        self.pending_draws = []
+        self.last_state.update(delta)
+        self.systems[tick] = self.simulator.capture_systems()
+        
+        if tick % self.checkpoint_interval == 0 or not self.checkpoint_ticks:
+            rng_states = {key: stream.getstate() for key, stream in self.simulator.rng.streams.items()}
+            self.checkpoints[tick] = (dict(self.last_state), rng_states)
+            self.checkpoint_ticks.append(tick)
+        return delta
+    
+    def _nearest_checkpoint(self, tick):
+        index = bisect_right(self.checkpoint_ticks, tick) - 1
+        if index < 0:
+            return None
+        return self.checkpoint_ticks[index]
+    
+    def state_at(self, tick):
+        """Відновити стан на кінець такту з найближчої контрольної точки та змін"""
+        base = self._nearest_checkpoint(tick)
+        if base is None or tick > self.simulator.current_tick:
+            return None
+        state = dict(self.checkpoints[base][0])
+        for t in range(base + 1, tick + 1):
+            state.update(self.deltas.get(t, {}))
+        return state
+    
+    def rng_states_at(self, tick):
+        """Відновити стани потоків випадкових чисел на кінець такту"""
+        base = self._nearest_checkpoint(tick)
+        if base is None:
+            return None
+        streams = {}
+        for key, rng_state in self.checkpoints[base][1].items():
+            streams[key] = random.Random()
+            streams[key].setstate(rng_state)
+        
+        for t in range(base + 1, tick + 1):
+            for key, method, arg in self.draws.get(t, ()):
+                if key not in streams:
+                    streams[key] = random.Random(self.simulator.rng.derive_seed(*key))
+                if method == "random":
+                    streams[key].random()
+                else:
+                    streams[key].getrandbits(arg)
+        return {key: stream.getstate() for key, stream in streams.items()}
+    
+    def changes_at(self, tick):
+        return self.deltas.get(tick, {})
+    
+    def restore(self, tick):
+        """Перемотати живий симулятор до стану на кінець такту"""
+        state = self.state_at(tick)
+        if state is None:
+            return False
+        rng_states = self.rng_states_at(tick)
+        
+        self.simulator.apply_state(state)
+        self.simulator.rng.streams = {}
+        for key, rng_state in rng_states.items():
+            stream = RecordingRandom(0, key, self)
+            stream.setstate(rng_state)
+            self.simulator.rng.streams[key] = stream
+        if tick in self.systems:
+            self.simulator.apply_systems(self.systems[tick])
+        
+        # Історія після цього такту відкидається
+        for t in [t for t in self.deltas if t > tick]:
+            del self.deltas[t]
+            self.draws.pop(t, None)
+            self.systems.pop(t, None)
+            self.checkpoints.pop(t, None)
+        self.checkpoint_ticks = [t for t in self.checkpoint_ticks if t <= tick]
+        self.pending_draws = []
+        self.last_state = state
+        self._reindex()
+        self.dirty = {}
+        self.simulator.current_tick = tick
+        return True
+
 
 class Soldier:
     RANKS = ["Рядовий", "Капрал", "Сержант", "Лейтенант", "Капітан", "Майор"]
     STATUS_TYPES = ["Активний", "Поранений", "Недоступний", "У відпустці", "Зниклий безвісти"]
+    CARRY_LIMIT = 25.0  # максимальна вага спорядження, кг
+    VIEW_RANGE = 15.0  # базова дальність огляду
+    OPTICS = ("Бінокль", "Нічний приціл")
     
-    def __init__(self, name, status, location, rank="Рядовий", health=100, equipment=None):
+    def __init__(self, name, status, location, rank="Рядовий", health=100, equipment=None, message_store=None,
+                 equipment_database=None, event_store=None):
         self.name = name
         self.status = status if status in self.STATUS_TYPES else "Активний"
         self.location = location  # координати (x, y)
@@ -15,39 +746,93 @@ class Soldier:
         self.health = health
         self.equipment = equipment or {}
         self.mission = None
-        self.messages_received = []
+        self.message_store = message_store or MessageStore.default()
         self.experience = 0
         self.skills = {"бойові": 1, "медичні": 1, "розвідка": 1, "лідерство": 1}
         self.history = []
-        self.log_event(f"Солдат створений зі званням {rank}")
+        self.event_store = event_store or EventStore.default()
+        self.status_indexes = []  # індекси команд і симулятора, що містять солдата
+        self.equipment_database = equipment_database if equipment_database is not None else EQUIPMENT_DATABASE
+        self._metrics = None
+        self.on_change = None  # виклик при зміні стану солдата
+        self.log_event("Солдат створений зі званням {}", "створення", rank)
     
     def update_status(self, new_status):
         if new_status not in self.STATUS_TYPES:
             return False
             
         old_status = self.status
-        self.status = new_status
-        self.log_event(f"Статус оновлено з {old_status} на {self.status}")
+        self._set_status(new_status)
+        self.log_event("Статус оновлено з {} на {}", "статус", old_status, self.status)
         return True
     
+    def _set_status(self, new_status):
+        """Змінити статус і оновити всі індекси за статусом"""
+        old_status = self.status
+        self.status = new_status
+        for index in self.status_indexes:
+            index.move(self, old_status, new_status)
+        self._changed()
+    
+    def metrics(self):
+        """Кешовані похідні показники: навантаження, ефективність спорядження, бойова міць, дальність огляду"""
+        if self._metrics is None:
+            load = effectiveness = optics = 0
+            for item, quantity in self.equipment.items():
+                info = self.equipment_database.get(item)
+                if info:
+                    load += info["вага"] * quantity
+                    effectiveness += info["ефективність"] * quantity
+                    if item in self.OPTICS:
+                        optics = max(optics, info["ефективність"])
+            skill_score = 2 * self.skills.get("бойові", 0) + self.skills.get("медичні", 0) + self.skills.get("розвідка", 0) + self.skills.get("лідерство", 0)
+            self._metrics = {
+                "навантаження": round(load, 2),
+                "ефективність": effectiveness,
+                "бойова міць": round(skill_score * (1 + effectiveness / 50), 2),
+                "дальність огляду": self.VIEW_RANGE + 3 * self.skills.get("розвідка", 0) + 2 * optics
+            }
+        return self._metrics
+    
+    def invalidate_metrics(self):
+        self._metrics = None
+        for index in self.status_indexes:
+            index.touch()
+        self._changed()
+    
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+    
     def update_location(self, new_location):
         distance = self._calculate_distance(self.location, new_location)
         self.location = new_location
-        self.log_event(f"Локацію оновлено на {self.location} (переміщено на {distance:.2f} одиниць)")
+        self._changed()
+        self.log_event("Локацію оновлено на {} (переміщено на {:.2f} одиниць)", "переміщення", self.location, distance)
         return True
     
     def send_message(self, message):
         msg = f"{self.rank} {self.name} відправляє: {message}"
-        self.log_event(f"Надіслано повідомлення: {message}")
+        self.log_event("Надіслано повідомлення: {}", "повідомлення", message)
         return msg
     
-    def receive_message(self, sender, message):
-        self.messages_received.append((sender, message, datetime.now()))
-        self.log_event(f"Отримано повідомлення від {sender}")
+    @property
+    def messages_received(self):
+        return [(sender, message, sent) for _, sent, sender, message, _ in self.message_store.inbox(self)]
+    
+    def receive_message(self, sender, message, entry=None):
+        # Повідомлення, вже збережене у спільному сховищі, не копіюється
+        if entry is None:
+            self.message_store.post(sender, message, recipients=(self,), to=self.name)
+        self.log_event("Отримано повідомлення від {}", "повідомлення", sender)
+    
+    def read_messages(self):
+        """Повернути непрочитані повідомлення та посунути курсор читання"""
+        return [(sender, message, sent) for _, sent, sender, message, _ in self.message_store.unread(self)]
     
     def assign_mission(self, mission):
         self.mission = mission
-        self.log_event(f"Призначено на місію: {mission}")
+        self.log_event("Призначено на місію: {}", "місія", mission)
     
     def update_health(self, amount):
         old_health = self.health
@@ -57,10 +842,11 @@ class Soldier:
             self.health = 100
         elif self.health <= 0:
             self.health = 0
-            self.status = "Поранений"
-            self.log_event("Поранений і потребує медичної допомоги!")
+            self._set_status("Поранений")
+            self.log_event("Поранений і потребує медичної допомоги!", "поранення")
         
-        self.log_event(f"Здоров'я змінено з {old_health} на {self.health}")
+        self.invalidate_metrics()
+        self.log_event("Здоров'я змінено з {} на {}", "здоров'я", old_health, self.health)
         return self.health
     
     def add_equipment(self, item, quantity=1):
@@ -68,17 +854,19 @@ class Soldier:
             self.equipment[item] += quantity
         else:
             self.equipment[item] = quantity
-        self.log_event(f"Отримано {quantity} {item}")
+        self.invalidate_metrics()
+        self.log_event("Отримано {} {}", "спорядження", quantity, item)
     
     def use_equipment(self, item, quantity=1):
         if item in self.equipment and self.equipment[item] >= quantity:
             self.equipment[item] -= quantity
-            self.log_event(f"Використано {quantity} {item}")
+            self.log_event("Використано {} {}", "спорядження", quantity, item)
             if self.equipment[item] == 0:
                 del self.equipment[item]
+            self.invalidate_metrics()
             return True
         else:
-            self.log_event(f"Недостатньо {item}")
+            self.log_event("Недостатньо {}", "спорядження", item)
             return False
     
     def report_status(self):
@@ -91,30 +879,34 @@ class Soldier:
             "спорядження": self.equipment,
             "місія": self.mission,
             "досвід": self.experience,
-            "навички": self.skills
+            "навички": self.skills,
+            "навантаження": self.metrics()["навантаження"],
+            "бойова міць": self.metrics()["бойова міць"]
         }
     
     def gain_experience(self, amount):
         self.experience += amount
-        self.log_event(f"Отримано {amount} очок досвіду")
+        self.log_event("Отримано {} очок досвіду", "досвід", amount)
         
         # Перевірка на підвищення звання
         current_rank_index = self.RANKS.index(self.rank) if self.rank in self.RANKS else 0
         if self.experience >= 100 * (current_rank_index + 1) and current_rank_index < len(self.RANKS) - 1:
             self.rank = self.RANKS[current_rank_index + 1]
-            self.log_event(f"Підвищено до звання {self.rank}")
+            self.log_event("Підвищено до звання {}", "досвід", self.rank)
     
     def improve_skill(self, skill_name, amount=1):
         if skill_name in self.skills:
             self.skills[skill_name] += amount
-            self.log_event(f"Навичка {skill_name} покращена на {amount}")
+            self.invalidate_metrics()
+            self.log_event("Навичка {} покращена на {}", "навички", skill_name, amount)
             return True
         return False
     
-    def log_event(self, description):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        event = f"{timestamp}: {self.rank} {self.name} - {description}"
+    def log_event(self, template, event_type="загальне", *args):
+        event = EVENT_TEMPLATES.encode(template, args, "{} {} - ", (self.rank, self.name))
         self.history.append(event)
+        self.event_store.record("солдат", self.name, event_type, event)
+        self._changed()
         return event
     
     def _calculate_distance(self, point1, point2):
@@ -125,41 +917,130 @@ class Soldier:
 
 
 class Team:
-    def __init__(self, name, commander=None):
+    def __init__(self, name, commander=None, message_store=None, event_store=None, radio_network=None):
         self.name = name
         self.members = []
         self.commander = commander
         self.mission_log = []
+        self.archived_log_entries = 0
+        self.event_store = event_store or EventStore.default()
         self.created_date = datetime.now()
-        self.team_chat = []
+        self.message_store = message_store or MessageStore.default()
         self.equipment_inventory = {}
         self.location = (0, 0)
         self.status = "У резерві"
+        self.status_index = StatusIndex(Soldier.STATUS_TYPES, on_change=self.invalidate_metrics)
+        self._metrics = None
+        self._rollup = None
+        self._fingerprint = None
+        self.unit = None  # відділення, до якого входить команда
+        self.radio_network = radio_network  # без мережі повідомлення доходять до всіх
+        self.message_bus = None  # без шини повідомлення доставляються одразу
+        self.on_change = None  # виклик при зміні стану команди
     
     def add_member(self, soldier):
         self.members.append(soldier)
-        self.log_event(f"{soldier.rank} {soldier.name} додано до команди")
+        if self.status_index not in soldier.status_indexes:
+            soldier.status_indexes.append(self.status_index)
+        self.status_index.add(soldier)
+        self.log_event("{} {} додано до команди", "склад", soldier.rank, soldier.name)
         return True
     
     def remove_member(self, soldier):
         if soldier in self.members:
             self.members.remove(soldier)
-            self.log_event(f"{soldier.rank} {soldier.name} видалено з команди")
+            if soldier not in self.members:
+                self.status_index.discard(soldier)
+                soldier.status_indexes.remove(self.status_index)
+            self.log_event("{} {} видалено з команди", "склад", soldier.rank, soldier.name)
             return True
         return False
     
     def set_commander(self, soldier):
         if soldier in self.members:
             self.commander = soldier
-            self.log_event(f"{soldier.rank} {soldier.name} тепер командир")
+            self.log_event("{} {} тепер командир", "склад", soldier.rank, soldier.name)
             return True
         else:
-            self.log_event(f"{soldier.rank} {soldier.name} не в команді")
+            self.log_event("{} {} не в команді", "склад", soldier.rank, soldier.name)
             return False
     
+    def members_with_status(self, status):
+        """Повернути членів команди з вказаним статусом"""
+        return self.status_index.get(status)
+    
+    def metrics(self):
+        """Кешовані зведені показники активних членів команди"""
+        if self._metrics is None:
+            skill_sum = load = effectiveness = combat_power = 0
+            for member in self.members_with_status("Активний"):
+                skill_sum += member.skills["бойові"] + member.skills["медичні"] + member.skills["розвідка"] + member.skills["лідерство"]
+                member_metrics = member.metrics()
+                load += member_metrics["навантаження"]
+                effectiveness += member_metrics["ефективність"]
+                combat_power += member_metrics["бойова міць"]
+            self._metrics = {
+                "всього": len(self.members),
+                "активні": self.status_index.count("Активний"),
+                "навички": skill_sum,
+                "навантаження": round(load, 2),
+                "ефективність": effectiveness,
+                "бойова міць": round(combat_power, 2)
+            }
+        return self._metrics
+    
+    def invalidate_metrics(self):
+        self._metrics = None
+        self._rollup = None
+        self._fingerprint = None
+        if self.unit:
+            self.unit.invalidate()
+        self._changed()
+    
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+    
+    def fingerprint(self):
+        """Кешований відбиток складу: статуси та навички членів незалежно від їхнього порядку"""
+        if self._fingerprint is None:
+            # Сам впорядкований кортеж, а не його хеш: колізія хешів дала б чужий результат з кешу
+            self._fingerprint = tuple(sorted(
+                (member.status, tuple(member.skills.values())) for member in self.members
+            ))
+        return self._fingerprint
+    
+    def rollup(self):
+        """Кешовані зведені показники всіх членів для ієрархії підрозділів"""
+        if self._rollup is None:
+            statuses = {}
+            skills = {}
+            equipment = {}
+            health = 0
+            for member in self.members:
+                statuses[member.status] = statuses.get(member.status, 0) + 1
+                for skill, value in member.skills.items():
+                    skills[skill] = skills.get(skill, 0) + value
+                for item, quantity in member.equipment.items():
+                    equipment[item] = equipment.get(item, 0) + quantity
+                health += member.health
+            self._rollup = {
+                "особовий склад": len(self.members),
+                "здоров'я": health,
+                "статуси": statuses,
+                "навички": skills,
+                "спорядження": equipment
+            }
+        return self._rollup
+    
+    def composition(self):
+        """Повернути (всього членів, активних, сума основних навичок активних)"""
+        metrics = self.metrics()
+        return metrics["всього"], metrics["активні"], metrics["навички"]
+    
     def team_status(self):
-        active_count = sum(1 for member in self.members if member.status == "Активний")
-        injured_count = sum(1 for member in self.members if member.status == "Поранений")
+        active_count = self.status_index.count("Активний")
+        injured_count = self.status_index.count("Поранений")
         
         status_report = f"\nЗвіт про стан команди {self.name}:\n"
         status_report += f"Всього членів: {len(self.members)}, Активні: {active_count}, Поранені: {injured_count}\n"
@@ -168,63 +1049,128 @@ class Team:
             status_report += f"Командир: {self.commander.rank} {self.commander.name}\n"
         
         status_report += f"Поточна локація: {self.location}\n"
-        status_report += f"Поточний статус: {self.status}\n\n"
+        status_report += f"Поточний статус: {self.status}\n"
+        status_report += f"Навантаження активних: {self.metrics()['навантаження']} кг, Бойова міць: {self.metrics()['бойова міць']}\n\n"
         
         status_report += "Члени команди:\n"
         for member in self.members:
             status_report += f"{member.rank} {member.name}: {member.status} на {member.location}, Здоров'я: {member.health}%\n"
         
-        self.log_event("Згенеровано звіт про стан команди")
+        self.log_event("Згенеровано звіт про стан команди", "звіт")
         return status_report
     
-    def broadcast_message(self, message, sender="Штаб"):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        broadcast = f"{timestamp} - {sender}: {message}"
-        self.team_chat.append(broadcast)
-        
+    @property
+    def team_chat(self):
+        chat = []
+        for _, sent, sender, message, to in self.message_store.inbox(self):
+            timestamp = sent.strftime("%Y-%m-%d %H:%M:%S")
+            if to is None:
+                chat.append(f"{timestamp} - {sender}: {message}")
+            else:
+                chat.append(f"{timestamp} - {sender} до {to}: {message}")
+        return chat
+    
+    def _relay(self, sender):
+        """Член команди, від якого поширюється повідомлення: сам відправник, командир або перший з рацією"""
         for member in self.members:
-            member.receive_message(sender, message)
+            if member.name == sender:
+                return member
+        if self.commander in self.members:
+            return self.commander
+        return next((member for member in self.members if member.equipment.get(self.radio_network.item, 0) > 0), None)
+    
+    def reachable_members(self, sender="Штаб"):
+        """Члени команди, з якими відправник має зв'язок"""
+        if self.radio_network is None:
+            return list(self.members)
+        relay = self._relay(sender)
+        if relay is None:
+            return []
+        return [member for member in self.members if self.radio_network.connected(relay, member)]
+    
+    def broadcast_message(self, message, sender="Штаб", priority="Звичайне"):
+        reachable = self.reachable_members(sender)
+        
+        if self.message_bus is not None:
+            # Доставка пакетом шини; отримувачі визначаються зв'язком на момент відправлення
+            self.message_bus.publish(
+                MessageBus.team_topic(self.name), message, sender, priority, recipients=[self] + reachable,
+                callback=lambda entry: self._received(reachable, sender, message, entry)
+            )
+            self._log_broadcast(sender, message, reachable)
+            return True
+        
+        # Одне збереження на сховище замість копії для кожного члена
+        recipients_by_store = {id(self.message_store): (self.message_store, [self])}
+        for member in reachable:
+            recipients_by_store.setdefault(id(member.message_store), (member.message_store, []))[1].append(member)
         
-        self.log_event(f"Повідомлення відправлено від {sender}: {message}")
+        for store, recipients in recipients_by_store.values():
+            entry = store.post(sender, message, recipients)
+        
+        self._received(reachable, sender, message, entry)
+        self._log_broadcast(sender, message, reachable)
         return True
     
-    def direct_message(self, sender, recipient_name, message):
+    @staticmethod
+    def _received(members, sender, message, entry):
+        for member in members:
+            member.receive_message(sender, message, entry)
+    
+    def _log_broadcast(self, sender, message, reachable):
+        self.log_event("Повідомлення відправлено від {}: {}", "повідомлення", sender, message)
+        if len(reachable) < len(self.members):
+            self.log_event("Без зв'язку залишилися {} з {} членів", "зв'язок", len(self.members) - len(reachable), len(self.members))
+    
+    def direct_message(self, sender, recipient_name, message, priority="Звичайне"):
         for member in self.members:
             if member.name == recipient_name:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                dm = f"{timestamp} - {sender} до {recipient_name}: {message}"
-                self.team_chat.append(dm)
-                
-                member.receive_message(sender, message)
-                self.log_event(f"Пряме повідомлення від {sender} до {recipient_name}")
+                if self.radio_network is not None:
+                    relay = self._relay(sender)
+                    if relay is None or not self.radio_network.connected(relay, member):
+                        self.log_event("Немає зв'язку між {} та {}", "зв'язок", sender, recipient_name)
+                        return False
+                if self.message_bus is not None:
+                    self.message_bus.publish(
+                        MessageBus.team_topic(self.name), message, sender, priority, recipients=(self, member),
+                        to=recipient_name, callback=lambda entry: member.receive_message(sender, message, entry)
+                    )
+                else:
+                    if member.message_store is self.message_store:
+                        entry = self.message_store.post(sender, message, (self, member), to=recipient_name)
+                    else:
+                        entry = self.message_store.post(sender, message, (self,), to=recipient_name)
+                        entry = member.message_store.post(sender, message, (member,), to=recipient_name)
+                    member.receive_message(sender, message, entry)
+                self.log_event("Пряме повідомлення від {} до {}", "повідомлення", sender, recipient_name)
                 return True
                 
-        self.log_event(f"Отримувача {recipient_name} не знайдено")
+        self.log_event("Отримувача {} не знайдено", "повідомлення", recipient_name)
         return False
     
     def assign_team_mission(self, mission_description):
-        mission_id = len(self.mission_log) + 1
+        mission_id = self.archived_log_entries + len(self.mission_log) + 1
         mission = f"Місія #{mission_id}: {mission_description}"
         
-        for member in self.members:
-            if member.status == "Активний":
-                member.assign_mission(mission)
+        for member in self.members_with_status("Активний"):
+            member.assign_mission(mission)
         
         self.mission_log.append(mission)
         self.status = "На місії"
-        self.log_event(f"Команда призначена на місію {mission}")
+        self.log_event("Команда призначена на місію {}", "місія", mission)
         return mission_id
     
     def move_team(self, new_location, formation_spacing=5):
         if not self.members:
             return False
         
-        self.log_event(f"Команда переміщується до {new_location}")
+        self.log_event("Команда переміщується до {}", "переміщення", new_location)
         
         # Створення формації навколо цільової локації
         positions = []
+        active = self.status_index.groups["Активний"]
         for i, member in enumerate(self.members):
-            if member.status == "Активний":
+            if member in active:
                 # Проста формація
                 if i == 0:  # Командир або перший солдат у центрі
                     pos = new_location
@@ -254,7 +1200,7 @@ class Team:
                     report[item] = quantity
         
         self.equipment_inventory = report
-        self.log_event("Згенеровано звіт про спорядження")
+        self.log_event("Згенеровано звіт про спорядження", "звіт")
         
         report_str = f"\nЗвіт про спорядження команди {self.name}:\n"
         for item, quantity in report.items():
@@ -264,9 +1210,9 @@ class Team:
     
     def distribute_equipment(self, equipment_dict):
         """Розподілити спорядження рівномірно серед активних членів команди"""
-        active_members = [m for m in self.members if m.status == "Активний"]
+        active_members = self.members_with_status("Активний")
         if not active_members:
-            self.log_event("Немає активних членів для розподілу спорядження")
+            self.log_event("Немає активних членів для розподілу спорядження", "спорядження")
             return False
             
         for item, quantity in equipment_dict.items():
@@ -281,7 +1227,7 @@ class Team:
             for i in range(remainder):
                 active_members[i].add_equipment(item, 1)
                 
-        self.log_event(f"Спорядження розподілено серед {len(active_members)} активних членів")
+        self.log_event("Спорядження розподілено серед {} активних членів", "спорядження", len(active_members))
         return True
     
     def team_skill_report(self):
@@ -298,60 +1244,280 @@ class Team:
             avg = value / len(self.members) if self.members else 0
             report_str += f"- {skill.capitalize()}: Всього {value}, Середнє {avg:.1f}\n"
             
-        self.log_event("Згенеровано звіт про навички команди")
+        self.log_event("Згенеровано звіт про навички команди", "звіт")
         return report_str
     
-    def log_event(self, description):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        event = f"{timestamp}: Команда {self.name} - {description}"
+    def log_event(self, template, event_type="загальне", *args):
+        event = EVENT_TEMPLATES.encode(template, args, "Команда {} - ", (self.name,))
         self.mission_log.append(event)
+        self.event_store.record("команда", self.name, event_type, event)
+        self._changed()
         return event
     
     def __str__(self):
         return f"Команда {self.name} ({len(self.members)} членів, Командир: {self.commander.name if self.commander else 'Немає'})"
 
 
+class Unit:
+    """Вузол ієрархії підрозділів з кешованими зведеними показниками"""
+    
+    LEVELS = ["Відділення", "Взвод", "Рота", "Батальйон"]
+    
+    def __init__(self, name, level):
+        self.name = name
+        self.level = level if level in self.LEVELS else "Відділення"
+        self.parent = None
+        self.children = []
+        self.teams = []  # лише для відділень
+        self._rollup = None
+    
+    def add_child(self, unit):
+        if self.LEVELS.index(unit.level) >= self.LEVELS.index(self.level) or unit.parent is not None:
+            return False
+        unit.parent = self
+        self.children.append(unit)
+        self.invalidate()
+        return True
+    
+    def add_team(self, team):
+        if self.level != "Відділення" or team.unit is not None:
+            return False
+        team.unit = self
+        self.teams.append(team)
+        self.invalidate()
+        return True
+    
+    def invalidate(self):
+        """Позначити вузол і предків застарілими; зупиняється на вже застарілому предку"""
+        unit = self
+        while unit is not None and unit._rollup is not None:
+            unit._rollup = None
+            unit = unit.parent
+    
+    def rollup(self):
+        """Зведені показники підрозділу; перераховуються лише застарілі гілки"""
+        if self._rollup is None:
+            parts = [team.rollup() for team in self.teams] + [child.rollup() for child in self.children]
+            self._rollup = Unit.merge(parts)
+        return self._rollup
+    
+    @staticmethod
+    def merge(parts):
+        result = {"особовий склад": 0, "здоров'я": 0, "статуси": {}, "навички": {}, "спорядження": {}}
+        for part in parts:
+            result["особовий склад"] += part["особовий склад"]
+            result["здоров'я"] += part["здоров'я"]
+            for key in ["статуси", "навички", "спорядження"]:
+                totals = result[key]
+                for name, value in part[key].items():
+                    totals[name] = totals.get(name, 0) + value
+        return result
+    
+    def report(self):
+        rollup = self.rollup()
+        headcount = rollup["особовий склад"]
+        mean_health = rollup["здоров'я"] / headcount if headcount else 0
+        
+        report = f"\nЗвіт підрозділу {self.level} {self.name}:\n"
+        report += f"Особовий склад: {headcount}, Середнє здоров'я: {mean_health:.1f}%\n"
+        report += "Статуси:\n"
+        for status, count in rollup["статуси"].items():
+            report += f"- {status}: {count}\n"
+        report += "Навички (сума):\n"
+        for skill, value in rollup["навички"].items():
+            report += f"- {skill.capitalize()}: {value}\n"
+        report += "Спорядження:\n"
+        for item, quantity in rollup["спорядження"].items():
+            report += f"- {item}: {quantity}\n"
+        if self.children:
+            report += "Підпорядковані підрозділи: " + ", ".join(child.name for child in self.children) + "\n"
+        if self.teams:
+            report += "Команди: " + ", ".join(team.name for team in self.teams) + "\n"
+        return report
+    
+    def __str__(self):
+        return f"{self.level} {self.name}"
+
+
+class SuccessCache:
+    """LRU-кеш оцінок успіху за відбитком складу з лічильниками влучань і промахів"""
+    
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, compute):
+        """Значення з кешу або обчислене compute() з витісненням найдавнішого"""
+        value = self.lookup(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+    
+    def lookup(self, key):
+        """Значення з кешу або None; для пакетних обчислень, що не вкладаються в get()"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+    
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "записів": len(self.entries),
+            "влучань": self.hits,
+            "промахів": self.misses,
+            "частка влучань": round(self.hits * 100 / total, 1) if total else 0.0
+        }
+
+
+SUCCESS_CACHE = SuccessCache()
+
+
 class Mission:
     STATUS_TYPES = ["Очікує", "Активна", "Завершена", "Провалена", "Перервана"]
     
-    def __init__(self, name, description, location, teams=None):
+    def __init__(self, name, description, location, teams=None, event_store=None):
         self.name = name
         self.description = description
         self.location = location
         self.teams = teams or []
         self.status = "Очікує"
         self.objectives = []
+        self.completed_count = 0
+        self.ready_objectives = set()  # незавершені цілі з виконаними передумовами
+        self._ready_heap = []
+        self._plain_heap = []  # готові цілі без зони
+        self._dependents = []  # індекс цілі -> індекси цілей, що від неї залежать
         self.events = []
+        self.event_store = event_store or EventStore.default()
         self.start_time = None
         self.end_time = None
         self.difficulty = 1  # Шкала 1-10
         self.success_rate = 0
         self.rewards = {"досвід": 10}
+        self.on_change = None  # виклик при зміні стану місії
         
-        self.log_event(f"Місія створена: {name}")
+        self.log_event("Місія створена: {}", "створення", name)
     
     def add_team(self, team):
         self.teams.append(team)
-        self.log_event(f"Команда {team.name} додана до місії")
+        self.log_event("Команда {} додана до місії", "місія", team.name)
         return True
     
-    def add_objective(self, objective, completed=False):
-        self.objectives.append({"description": objective, "completed": completed, "added": datetime.now()})
-        self.log_event(f"Додано ціль: {objective}")
+    def add_objective(self, objective, completed=False, requires=None, location=None, radius=10.0, bounds=None,
+                      condition="прибуття", hold_ticks=3, min_soldiers=1):
+        """Додати ціль; requires - індекси попередніх цілей-передумов.
+        
+        Ціль з location (коло радіуса radius) або bounds (x0, y0, x1, y1) виконується
+        автоматично, коли в зоні min_soldiers солдатів місії: одразу при прибутті
+        або після hold_ticks тактів утримання.
+        """
+        index = len(self.objectives)
+        requires = sorted(set(requires or []))
+        if any(not 0 <= req < index for req in requires):
+            return False
+        if condition not in GeofenceSystem.CONDITIONS:
+            return False
+        
+        pending = sum(1 for req in requires if not self.objectives[req]["completed"])
+        entry = {
+            "description": objective,
+            "completed": completed,
+            "added": datetime.now(),
+            "requires": requires,
+            "pending_requirements": pending
+        }
+        if bounds is not None:
+            entry["area"] = {"bounds": tuple(bounds)}
+        elif location is not None:
+            entry["area"] = {"center": tuple(location), "radius": radius}
+        if "area" in entry:
+            entry.update(condition=condition, hold_ticks=hold_ticks, min_soldiers=min_soldiers)
+        self.objectives.append(entry)
+        self._dependents.append([])
+        for req in requires:
+            self._dependents[req].append(index)
+        
+        if completed:
+            self.completed_count += 1
+        elif pending == 0:
+            self._mark_ready(index)
+        
+        self.log_event("Додано ціль: {}", "ціль", objective)
         return True
     
+    def next_objective(self, skip_geofenced=False):
+        """Індекс найменшої готової до виконання цілі або None"""
+        # Цілі із зонами виконуються системою зон, а не жеребом, тому мають окрему купу
+        heap = self._plain_heap if skip_geofenced else self._ready_heap
+        while heap and heap[0] not in self.ready_objectives:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+    
+    def all_objectives_completed(self):
+        return self.completed_count == len(self.objectives)
+    
+    def _rebuild_objective_state(self):
+        """Перерахувати лічильники та множину готових цілей з прапорців completed"""
+        self.completed_count = 0
+        self.ready_objectives = set()
+        self._ready_heap = []
+        self._plain_heap = []
+        self._dependents = [[] for _ in self.objectives]
+        for index, objective in enumerate(self.objectives):
+            for req in objective["requires"]:
+                self._dependents[req].append(index)
+            objective["pending_requirements"] = sum(1 for req in objective["requires"] if not self.objectives[req]["completed"])
+            if objective["completed"]:
+                self.completed_count += 1
+            elif objective["pending_requirements"] == 0:
+                self._mark_ready(index)
+    
+    def _mark_ready(self, index):
+        self.ready_objectives.add(index)
+        heapq.heappush(self._ready_heap, index)
+        if "area" not in self.objectives[index]:
+            heapq.heappush(self._plain_heap, index)
+    
     def complete_objective(self, index):
         if 0 <= index < len(self.objectives):
-            self.objectives[index]["completed"] = True
-            self.objectives[index]["completed_time"] = datetime.now()
-            self.log_event(f"Ціль завершена: {self.objectives[index]['description']}")
+            objective = self.objectives[index]
+            if objective["completed"]:
+                return True
+            if objective["pending_requirements"] > 0:
+                self.log_event("Ціль недоступна, передумови не виконані: {}", "ціль", objective['description'])
+                return False
+            
+            objective["completed"] = True
+            objective["completed_time"] = datetime.now()
+            self.completed_count += 1
+            self.ready_objectives.discard(index)
+            for dependent in self._dependents[index]:
+                self.objectives[dependent]["pending_requirements"] -= 1
+                if self.objectives[dependent]["pending_requirements"] == 0 and not self.objectives[dependent]["completed"]:
+                    self._mark_ready(dependent)
+            self.log_event("Ціль завершена: {}", "ціль", objective['description'])
             
             # Перевірка, чи всі цілі завершені
-            if all(obj["completed"] for obj in self.objectives):
+            if self.all_objectives_completed():
                 self.status = "Завершена"
                 self.end_time = datetime.now()
                 self.success_rate = 100
-                self.log_event("Всі цілі завершені")
+                self.log_event("Всі цілі завершені", "ціль")
                 
                 # Нагородження досвідом членів команди
                 for team in self.teams:
@@ -361,10 +1527,12 @@ class Mission:
             return True
         return False
     
-    def log_event(self, description):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        event = f"{timestamp}: {description}"
+    def log_event(self, template, event_type="загальне", *args):
+        event = EVENT_TEMPLATES.encode(template, args)
         self.events.append(event)
+        self.event_store.record("місія", self.name, event_type, event)
+        if self.on_change:
+            self.on_change(self)
         return event
     
     def update_status(self, new_status):
@@ -379,7 +1547,7 @@ class Mission:
         elif new_status in ["Завершена", "Провалена", "Перервана"] and not self.end_time:
             self.end_time = datetime.now()
             
-        self.log_event(f"Статус оновлено з {old_status} на {self.status}")
+        self.log_event("Статус оновлено з {} на {}", "статус", old_status, self.status)
         return True
     
     def set_difficulty(self, level):
@@ -387,17 +1555,17 @@ class Mission:
         if 1 <= level <= 10:
             self.difficulty = level
             self.rewards["досвід"] = level * 10  # Вища складність, вищі нагороди
-            self.log_event(f"Складність встановлено на {level}")
+            self.log_event("Складність встановлено на {}", "місія", level)
             return True
         return False
     
     def add_reward(self, reward_type, value):
         self.rewards[reward_type] = value
-        self.log_event(f"Додано нагороду: {reward_type} = {value}")
+        self.log_event("Додано нагороду: {} = {}", "місія", reward_type, value)
         return True
     
     def mission_report(self):
-        completed = sum(1 for obj in self.objectives if obj["completed"])
+        completed = self.completed_count
         
         report = f"\nЗвіт про місію: {self.name}\n"
         report += f"Статус: {self.status}\n"
@@ -419,6 +1587,11 @@ class Mission:
         for i, obj in enumerate(self.objectives):
             status = "✓" if obj["completed"] else "✗"
             report += f"  {status} {i+1}. {obj['description']}\n"
+            if "area" in obj:
+                area = obj["area"]
+                zone = f"межі {area['bounds']}" if "bounds" in area else f"{area['center']}, радіус {area['radius']}"
+                hold = f" {obj['hold_ticks']} тактів" if obj["condition"] == "утримання" else ""
+                report += f"     зона: {zone}, {obj['condition']}{hold}, солдатів: {obj['min_soldiers']}\n"
         
         report += "\nКоманди, призначені на місію:\n"
         for team in self.teams:
@@ -429,92 +1602,2185 @@ class Mission:
             for event in self.events[-5:]:
                 report += f"  - {event}\n"
         
-        self.log_event("Згенеровано звіт про місію")
+        self.log_event("Згенеровано звіт про місію", "звіт")
         return report
     
-    def calculate_success_probability(self):
-        """Розрахувати ймовірність успіху місії на основі складу команди"""
-        if not self.teams or not any(team.members for team in self.teams):
-            return 0
-            
-        total_members = sum(len(team.members) for team in self.teams)
-        active_members = sum(sum(1 for m in team.members if m.status == "Активний") for team in self.teams)
-        
+    @staticmethod
+    def estimate_success(total_members, active_members, skill_sum, difficulty):
+        """Ймовірність успіху (0-100) для складу без зміни стану місії"""
         if active_members == 0:
             return 0
             
         active_ratio = active_members / total_members
         
-        # Розрахунок середнього рівня навичок у всіх командах
-        combat = medical = recon = leadership = 0
-        for team in self.teams:
-            for member in team.members:
-                if member.status == "Активний":
-                    combat += member.skills["бойові"]
-                    medical += member.skills["медичні"]
-                    recon += member.skills["розвідка"]
-                    leadership += member.skills["лідерство"]
-        
         # Середній рівень навичок (шкала 1-10)
-        avg_skill = (combat + medical + recon + leadership) / (active_members * 4) if active_members > 0 else 0
+        avg_skill = skill_sum / (active_members * 4)
         
         # Формула ймовірності успіху: нормалізований рівень навичок проти складності, з урахуванням активного складу
-        probability = (avg_skill / 10) * (1 / self.difficulty) * active_ratio * 100
-        probability = min(100, max(0, probability))
+        probability = (avg_skill / 10) * (1 / difficulty) * active_ratio * 100
+        return min(100, max(0, probability))
+    
+    @staticmethod
+    def simulate_outcomes(total_members, member_skills, difficulty, objectives, trials=1000, seed=0,
+                          injury_chance=0.02, failure_chance=0.3):
+        """Монте-Карло: частка прогонів (0-100), у яких усі цілі виконано до провалу місії.
+        
+        Кожна спроба цілі вдається з імовірністю estimate_success для поточного складу;
+        після успіху кожен активний може вибути через поранення, після невдачі місія
+        провалюється з імовірністю failure_chance.
+        """
+        if objectives <= 0:
+            return 100.0
+        rng = random.Random(seed)
+        successes = 0
+        max_attempts = objectives * 3
+        for _ in range(trials):
+            skills = list(member_skills)
+            skill_sum = sum(skills)
+            remaining = objectives
+            attempts = 0
+            while remaining and skills and attempts < max_attempts:
+                attempts += 1
+                if rng.random() * 100 < Mission.estimate_success(total_members, len(skills), skill_sum, difficulty):
+                    remaining -= 1
+                    skills = [skill for skill in skills if rng.random() >= injury_chance]
+                    skill_sum = sum(skills)
+                elif rng.random() < failure_chance:
+                    break
+            if not remaining:
+                successes += 1
+        return successes * 100 / trials
+    
+    def _composition_totals(self):
+        total_members = active_members = skill_sum = 0
+        for team in self.teams:
+            team_total, team_active, team_skills = team.composition()
+            total_members += team_total
+            active_members += team_active
+            skill_sum += team_skills
+        return total_members, active_members, skill_sum
+    
+    def monte_carlo_success(self, trials=1000, seed=0):
+        """Оцінка Монте-Карло для решти цілей, кешована за відбитком складу команд"""
+        remaining = len(self.objectives) - self.completed_count
+        key = ("монте-карло", tuple(sorted(team.fingerprint() for team in self.teams)), self.difficulty, remaining, trials, seed)
+        
+        def compute():
+            total_members = sum(len(team.members) for team in self.teams)
+            member_skills = [
+                sum(member.skills[skill] for skill in ("бойові", "медичні", "розвідка", "лідерство"))
+                for team in self.teams for member in team.members_with_status("Активний")
+            ]
+            if not member_skills:
+                return 0.0
+            return round(self.simulate_outcomes(total_members, member_skills, self.difficulty, remaining, trials, seed), 1)
+        
+        return SUCCESS_CACHE.get(key, compute)
+    
+    def calculate_success_probability(self):
+        """Розрахувати ймовірність успіху місії на основі складу команди"""
+        if not self.teams or not any(team.members for team in self.teams):
+            return 0
+        
+        total_members, active_members, skill_sum = self._composition_totals()
+        if active_members == 0:
+            return 0
+        
+        probability = self.estimate_success(total_members, active_members, skill_sum, self.difficulty)
         
         self.success_rate = round(probability, 1)
-        self.log_event(f"Розраховано ймовірність успіху: {self.success_rate}%")
+        self.log_event("Розраховано ймовірність успіху: {}%", "оцінка", self.success_rate)
         return self.success_rate
     
     def __str__(self):
         return f"Місія: {self.name} ({self.status})"
 
 
+class AssignmentOptimizer:
+    """Розподіл команд по місіях з максимізацією сумарної ймовірності успіху.
+    
+    Пари оцінюються замкненою формулою Mission.estimate_success без кешу: вона дешевша
+    за звернення до SUCCESS_CACHE, а Монте-Карло для кожної пари надто дороге.
+    """
+    
+    # Точний угорський алгоритм для невеликих задач, жадібний для великих
+    HUNGARIAN_LIMIT = 2_000_000
+    
+    def __init__(self, min_active=1, max_distance=None):
+        self.min_active = min_active
+        self.max_distance = max_distance
+    
+    def score_matrix(self, teams, missions):
+        """Матриця очікуваного успіху; None для недопустимих пар"""
+        compositions = [team.composition() for team in teams]
+        # Внесок команд, що вже призначені на місію
+        existing = []
+        for mission in missions:
+            total = active = skills = 0
+            for team in mission.teams:
+                team_total, team_active, team_skills = team.composition()
+                total += team_total
+                active += team_active
+                skills += team_skills
+            existing.append((total, active, skills))
+        
+        assigned = {(id(team), j) for j, mission in enumerate(missions) for team in mission.teams}
+        limit = None if self.max_distance is None else self.max_distance ** 2
+        targets = [(j, mission.location, mission.difficulty, existing[j]) for j, mission in enumerate(missions)]
+        
+        # Mission.estimate_success, спрощена до навички * 2.5 / (складність * склад)
+        matrix = []
+        for team, (total, active, skills) in zip(teams, compositions):
+            if active < self.min_active:
+                matrix.append([None] * len(missions))
+                continue
+            tx, ty = team.location
+            row = []
+            append = row.append
+            for j, (mx, my), difficulty, (base_total, _, base_skills) in targets:
+                if limit is not None and (tx - mx) ** 2 + (ty - my) ** 2 > limit:
+                    append(None)
+                elif assigned and (id(team), j) in assigned:
+                    append(None)
+                else:
+                    score = (base_skills + skills) * 2.5 / (difficulty * (base_total + total))
+                    append(score if score < 100 else 100)
+            matrix.append(row)
+        return matrix
+    
+    def solve(self, teams, missions, method="auto"):
+        """Повернути список (команда, місія, ймовірність) з не більше ніж однією місією на команду"""
+        if not teams or not missions:
+            return []
+        matrix = self.score_matrix(teams, missions)
+        
+        if method == "auto":
+            size = len(teams) * len(missions) * min(len(teams), len(missions))
+            method = "hungarian" if size <= self.HUNGARIAN_LIMIT else "greedy"
+        
+        if method == "hungarian":
+            pairs = self._hungarian(matrix)
+        else:
+            pairs = self._greedy(matrix)
+        return [(teams[i], missions[j], matrix[i][j]) for i, j in pairs]
+    
+    def _greedy(self, matrix):
+        candidates = [
+            (-score, i, j)
+            for i, row in enumerate(matrix)
+            for j, score in enumerate(row)
+            if score is not None
+        ]
+        candidates.sort()
+        used_teams = set()
+        used_missions = set()
+        pairs = []
+        for score, i, j in candidates:
+            if i in used_teams or j in used_missions:
+                continue
+            used_teams.add(i)
+            used_missions.add(j)
+            pairs.append((i, j))
+        return pairs
+    
+    def _hungarian(self, matrix):
+        """Угорський алгоритм (потенціали) для прямокутної матриці"""
+        transposed = len(matrix) > len(matrix[0])
+        if transposed:
+            matrix = [list(column) for column in zip(*matrix)]
+        n, m = len(matrix), len(matrix[0])
+        
+        # Мінімізація вартості; недопустима пара рівноцінна відсутності призначення
+        cost = [[0.0 if score is None else -score for score in row] for row in matrix]
+        
+        inf = float("inf")
+        u = [0.0] * (n + 1)
+        v = [0.0] * (m + 1)
+        match = [0] * (m + 1)  # стовпець -> рядок (з 1)
+        way = [0] * (m + 1)
+        for i in range(1, n + 1):
+            match[0] = i
+            j0 = 0
+            minv = [inf] * (m + 1)
+            used = [False] * (m + 1)
+            while True:
+                used[j0] = True
+                i0 = match[j0]
+                row = cost[i0 - 1]
+                delta = inf
+                j1 = 0
+                for j in range(1, m + 1):
+                    if not used[j]:
+                        current = row[j - 1] - u[i0] - v[j]
+                        if current < minv[j]:
+                            minv[j] = current
+                            way[j] = j0
+                        if minv[j] < delta:
+                            delta = minv[j]
+                            j1 = j
+                for j in range(m + 1):
+                    if used[j]:
+                        u[match[j]] += delta
+                        v[j] -= delta
+                    else:
+                        minv[j] -= delta
+                j0 = j1
+                if match[j0] == 0:
+                    break
+            while j0:
+                j1 = way[j0]
+                match[j0] = match[j1]
+                j0 = j1
+        
+        pairs = []
+        for j in range(1, m + 1):
+            i = match[j]
+            if i and matrix[i - 1][j - 1] is not None:
+                pairs.append((j - 1, i - 1) if transposed else (i - 1, j - 1))
+        return pairs
+
+
+class EquipmentAllocator:
+    """Пакетний розподіл запасу спорядження між солдатами багатьох команд.
+    
+    Кожна наступна одиниця предмета цінується менше (ефективність / k), тому
+    жадібний вибір за цінністю на кілограм дає близький до оптимального розподіл
+    в межах ліміту ваги кожного солдата.
+    """
+    
+    # Навичка, що підсилює користь від предмета
+    ITEM_SKILLS = {
+        "Гвинтівка": "бойові",
+        "Пістолет": "бойові",
+        "Патрони": "бойові",
+        "Граната": "бойові",
+        "Аптечка": "медичні",
+        "Бінокль": "розвідка",
+        "Нічний приціл": "розвідка",
+        "Рація": "лідерство"
+    }
+    
+    def __init__(self, equipment_database, carry_limit=None):
+        self.equipment_database = equipment_database
+        self.carry_limit = Soldier.CARRY_LIMIT if carry_limit is None else carry_limit
+    
+    def load(self, soldier):
+        if soldier.equipment_database is self.equipment_database:
+            return soldier.metrics()["навантаження"]
+        return sum(self.equipment_database.get(item, {}).get("вага", 0) * quantity
+                   for item, quantity in soldier.equipment.items())
+    
+    def unit_value(self, soldier, item):
+        info = self.equipment_database[item]
+        skill = self.ITEM_SKILLS.get(item)
+        bonus = 1 + 0.1 * soldier.skills.get(skill, 0) if skill else 1
+        return info["ефективність"] * bonus
+    
+    def allocate(self, soldiers, pool):
+        """Повернути ({солдат: {предмет: кількість}}, залишок запасу)"""
+        pool = {item: quantity for item, quantity in pool.items() if item in self.equipment_database and quantity > 0}
+        capacity = [self.carry_limit - self.load(soldier) for soldier in soldiers]
+        held = [dict(soldier.equipment) for soldier in soldiers]
+        base_values = [{item: self.unit_value(soldier, item) for item in pool} for soldier in soldiers]
+        allocation = {}
+        
+        heap = []
+        for i, soldier in enumerate(soldiers):
+            for item in pool:
+                weight = self.equipment_database[item]["вага"]
+                if weight <= capacity[i]:
+                    marginal = base_values[i][item] / (held[i].get(item, 0) + 1)
+                    heap.append((-marginal / weight, i, item))
+        heapq.heapify(heap)
+        
+        while heap and pool:
+            _, i, item = heapq.heappop(heap)
+            if item not in pool:
+                continue
+            weight = self.equipment_database[item]["вага"]
+            if weight > capacity[i]:
+                continue
+            
+            capacity[i] -= weight
+            held[i][item] = held[i].get(item, 0) + 1
+            soldier_allocation = allocation.setdefault(soldiers[i], {})
+            soldier_allocation[item] = soldier_allocation.get(item, 0) + 1
+            pool[item] -= 1
+            if pool[item] == 0:
+                del pool[item]
+            elif weight <= capacity[i]:
+                marginal = base_values[i][item] / (held[i][item] + 1)
+                heapq.heappush(heap, (-marginal / weight, i, item))
+        
+        return allocation, pool
+
+
+class ParameterSweep:
+    """Перебір сітки параметрів місії: складність, набори команд, комплекти спорядження.
+    
+    Кожна точка оцінюється пакетним Монте-Карло в пулі процесів. Результати
+    запам'ятовуються в SUCCESS_CACHE за ключем складу та дописуються до файлу кешу,
+    тож повторний перебір не симулює знову, а перерваний продовжується з місця зупинки.
+    """
+    
+    DEFAULT_LOADOUTS = {"поточне": {}}
+    
+    def __init__(self, simulator, mission_name, difficulties=None, team_sets=None, loadouts=None, trials=2000,
+                 batch_size=500, seed=0, cache_path="sweep_cache.jsonl", workers=None):
+        self.simulator = simulator
+        self.mission = simulator.find_mission(mission_name)
+        if self.mission is None:
+            raise ValueError(f"Місію '{mission_name}' не знайдено")
+        self.difficulties = list(difficulties or [self.mission.difficulty])
+        for difficulty in self.difficulties:
+            if not 1 <= difficulty <= 10:
+                raise ValueError(f"Складність {difficulty} поза шкалою 1-10")
+        self.team_sets = [tuple(team_set) for team_set in (team_sets or [[team.name for team in self.mission.teams]])]
+        self.loadouts = loadouts or self.DEFAULT_LOADOUTS
+        self.trials = trials
+        self.batch_size = batch_size
+        self.seed = seed
+        self.cache_path = cache_path
+        self.workers = workers  # 0 - без пулу процесів
+        self.results = []
+    
+    def points(self):
+        return list(itertools.product(self.difficulties, self.team_sets, self.loadouts))
+    
+    def _inputs(self, point):
+        """Вхідні дані Монте-Карло для точки: (всього, навички активних, складність, цілей)"""
+        difficulty, team_names, loadout_name = point
+        loadout = self.loadouts[loadout_name]
+        database = self.simulator.equipment_database
+        members = {}
+        for team_name in team_names:
+            team = self.simulator.find_team(team_name)
+            if team is None:
+                raise ValueError(f"Команду '{team_name}' не знайдено")
+            for member in team.members:
+                members[id(member)] = member
+        
+        # Спорядження посилює навички так само, як у показнику бойова міць
+        member_skills = []
+        for member in members.values():
+            if member.status != "Активний":
+                continue
+            effectiveness = member.metrics()["ефективність"] + sum(
+                database[item]["ефективність"] * quantity for item, quantity in loadout.items() if item in database
+            )
+            skill_sum = sum(member.skills[skill] for skill in ("бойові", "медичні", "розвідка", "лідерство"))
+            member_skills.append(round(skill_sum * (1 + effectiveness / 50), 3))
+        
+        objectives = len(self.mission.objectives) - self.mission.completed_count
+        return len(members), tuple(sorted(member_skills)), difficulty, objectives
+    
+    def _key(self, inputs):
+        material = json.dumps([inputs, self.trials, self.batch_size, self.seed], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:20]
+    
+    def _load_cache(self):
+        cached = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding="utf-8") as cache_file:
+                for line in cache_file:
+                    if line.strip():
+                        record = json.loads(line)
+                        cached[record["ключ"]] = record["успіх"]
+        return cached
+    
+    def _batches(self, key, inputs):
+        total_members, member_skills, difficulty, objectives = inputs
+        batches = []
+        for start in range(0, self.trials, self.batch_size):
+            trials = min(self.batch_size, self.trials - start)
+            seed = int(hashlib.sha256(f"{key}:{start}:{self.seed}".encode("utf-8")).hexdigest()[:15], 16)
+            batches.append((total_members, list(member_skills), difficulty, objectives, trials, seed))
+        return batches
+    
+    def run(self, progress=None):
+        """Оцінити всі точки сітки; progress(виконано, всього) викликається після кожної точки"""
+        cached = self._load_cache()
+        points = self.points()
+        keyed = []
+        for point in points:
+            inputs = self._inputs(point)
+            keyed.append((point, inputs, self._key(inputs)))
+        
+        pending = {}
+        for point, inputs, key in keyed:
+            if key in cached or key in pending:
+                continue
+            success = SUCCESS_CACHE.lookup(("перебір", key))
+            if success is None:
+                pending[key] = self._batches(key, inputs)
+            else:
+                cached[key] = success
+        
+        done = len(points) - len(pending)
+        if pending:
+            with open(self.cache_path, "a", encoding="utf-8") as cache_file:
+                for key, success in self._evaluate(pending):
+                    cached[key] = success
+                    SUCCESS_CACHE.put(("перебір", key), success)
+                    cache_file.write(json.dumps({"ключ": key, "успіх": success}, ensure_ascii=False) + "\n")
+                    cache_file.flush()
+                    done += 1
+                    if progress:
+                        progress(done, len(points))
+        
+        self.results = []
+        for (difficulty, team_names, loadout_name), inputs, key in keyed:
+            total_members, member_skills, _, _ = inputs
+            self.results.append({
+                "складність": difficulty,
+                "команди": ", ".join(team_names),
+                "спорядження": loadout_name,
+                "солдатів": total_members,
+                "активних": len(member_skills),
+                "успіх": cached[key],
+                "формула": round(Mission.estimate_success(total_members, len(member_skills), sum(member_skills), difficulty), 1) if total_members else 0
+            })
+        self.results.sort(key=lambda row: (-row["успіх"], -row["формула"]))
+        self.simulator.log_event("Перебір параметрів місії {}: {} точок, з кешу {}", "оцінка",
+                                 self.mission.name, len(points), len(points) - len(pending))
+        return self.results
+    
+    def _evaluate(self, pending):
+        """Видавати (ключ, успіх) у міру завершення всіх пакетів точки"""
+        remaining = {key: len(batches) for key, batches in pending.items()}
+        successes = {key: 0.0 for key in pending}
+        
+        def finish(key, batch, share):
+            successes[key] += share * batch[4]
+            remaining[key] -= 1
+            if not remaining[key]:
+                return key, round(successes[key] / self.trials, 1)
+            return None
+        
+        if self.workers == 0:
+            for key, batches in pending.items():
+                for batch in batches:
+                    finished = finish(key, batch, Mission.simulate_outcomes(*batch))
+                    if finished:
+                        yield finished
+            return
+        
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(Mission.simulate_outcomes, *batch): (key, batch)
+                for key, batches in pending.items() for batch in batches
+            }
+            for future in concurrent.futures.as_completed(futures):
+                key, batch = futures[future]
+                finished = finish(key, batch, future.result())
+                if finished:
+                    yield finished
+    
+    def table(self, limit=None):
+        """Рейтингова таблиця результатів"""
+        rows = self.results[:limit] if limit else self.results
+        table = f"\n===== ПЕРЕБІР ПАРАМЕТРІВ: {self.mission.name} =====\n"
+        table += f"{'№':>3} {'Склад.':>6} {'Успіх МК':>9} {'Формула':>8}  {'Спорядження':<14} Команди\n"
+        for rank, row in enumerate(rows, 1):
+            table += f"{rank:>3} {row['складність']:>6} {row['успіх']:>8}% {row['формула']:>7}%  {row['спорядження']:<14} {row['команди']} ({row['активних']}/{row['солдатів']})\n"
+        return table
+
+
+class Depot:
+    def __init__(self, name, location, stock=None):
+        self.name = name
+        self.location = location
+        self.stock = dict(stock or {})
+    
+    def take(self, items):
+        """Видати наявну частину замовлення та повернути фактично видане"""
+        issued = {}
+        for item, quantity in items.items():
+            available = min(quantity, self.stock.get(item, 0))
+            if available > 0:
+                issued[item] = available
+                self.stock[item] -= available
+                if self.stock[item] == 0:
+                    del self.stock[item]
+        return issued
+    
+    def store(self, items):
+        """Прийняти спорядження на склад; недодатні кількості відкидаються"""
+        stored = False
+        for item, quantity in items.items():
+            if quantity > 0:
+                self.stock[item] = self.stock.get(item, 0) + quantity
+                stored = True
+        return stored
+    
+    def __str__(self):
+        return f"Склад {self.name} на {self.location} ({sum(self.stock.values())} одиниць)"
+
+
+class LogisticsSystem:
+    """Склади, черга заявок на поповнення та колони постачання, що оновлюються щотакту"""
+    
+    # Витрата на активного солдата за такт на активній місії
+    DEFAULT_CONSUMPTION = {"Вода": 0.2, "Патрони": 0.1}
+    
+    def __init__(self, simulator, convoy_speed=10, reorder_level=1):
+        self.simulator = simulator
+        self.depots = []
+        self.requests = deque()  # (команда, предмети, такт заявки)
+        self.convoys = []  # купа (такт прибуття, номер, команда, предмети, склад)
+        self.convoy_speed = convoy_speed
+        self.reorder_level = reorder_level  # мінімум одиниць на активного члена до автозаявки
+        self.consumption_rates = dict(self.DEFAULT_CONSUMPTION)
+        self._accumulated = {}  # солдат -> {предмет: накопичена дробова витрата}
+        self._requested = set()  # id команд з відкритою заявкою або колоною
+        self._convoy_seq = 0
+        self.consumed = {}
+        self.delivered = {}
+    
+    def add_depot(self, name, location, stock=None):
+        depot = Depot(name, location, stock)
+        self.depots.append(depot)
+        self.simulator.log_event("Склад створено: {} на {}", "логістика", name, location)
+        return depot
+    
+    def find_depot(self, name):
+        for depot in self.depots:
+            if depot.name.lower() == name.lower():
+                return depot
+        return None
+    
+    def request_resupply(self, team, items):
+        items = {item: quantity for item, quantity in items.items() if quantity > 0}
+        if not items:
+            return False
+        team = self.simulator.own(team)
+        self.requests.append((team, items, self.simulator.current_tick))
+        self._requested.add(id(team))
+        team.log_event("Заявка на поповнення: {}", "логістика", items)
+        return True
+    
+    def snapshot(self):
+        return (
+            [(depot, dict(depot.stock)) for depot in self.depots],
+            [(team, dict(items), requested_tick) for team, items, requested_tick in self.requests],
+            list(self.convoys), dict(self.consumption_rates),
+            {soldier: dict(accumulated) for soldier, accumulated in self._accumulated.items()},
+            self._convoy_seq, dict(self.consumed), dict(self.delivered)
+        )
+    
+    def restore(self, state):
+        depots, requests, convoys, rates, accumulated, self._convoy_seq, consumed, delivered = state
+        own = self.simulator.own
+        self.depots = []
+        for depot, stock in depots:
+            depot.stock = dict(stock)
+            self.depots.append(depot)
+        self.requests = deque((own(team), dict(items), requested_tick) for team, items, requested_tick in requests)
+        self.convoys = [(arrival, seq, own(team), items, depot_name) for arrival, seq, team, items, depot_name in convoys]
+        self.consumption_rates = dict(rates)
+        self._accumulated = {own(soldier): dict(items) for soldier, items in accumulated.items()}
+        self._requested = {id(team) for team, _, _ in self.requests} | {id(convoy[2]) for convoy in self.convoys}
+        self.consumed = dict(consumed)
+        self.delivered = dict(delivered)
+    
+    def tick(self, tick):
+        """Один пакетний прохід: витрата, автозаявки, відправлення та прибуття колон"""
+        self._consume()
+        self._dispatch(tick)
+        self._deliver(tick)
+    
+    def _consume(self):
+        rates = self.consumption_rates
+        # Залишаються накопичення лише солдатів, що витрачають і в цьому проході
+        previous, self._accumulated = self._accumulated, {}
+        for mission in self.simulator.missions:
+            if mission.status != "Активна" or not mission.teams:
+                continue
+            mission = self.simulator.own(mission)
+            for team in mission.teams:
+                shortages = {}
+                active = team.members_with_status("Активний")
+                for member in active:
+                    accumulated = self._accumulated.get(member)
+                    if accumulated is None:
+                        accumulated = self._accumulated[member] = previous.get(member, {})
+                    changed = False
+                    for item, rate in rates.items():
+                        total = accumulated.get(item, 0) + rate
+                        units = int(total)
+                        accumulated[item] = total - units
+                        if units:
+                            held = member.equipment.get(item, 0)
+                            used = min(units, held)
+                            if used:
+                                if used == held:
+                                    del member.equipment[item]
+                                else:
+                                    member.equipment[item] = held - used
+                                self.consumed[item] = self.consumed.get(item, 0) + used
+                                changed = True
+                        shortages[item] = shortages.get(item, 0) + member.equipment.get(item, 0)
+                    if changed:
+                        member.invalidate_metrics()
+                
+                # Автоматична заявка, коли запас на активного члена нижче порогу
+                if active and id(team) not in self._requested:
+                    need = {
+                        item: self.reorder_level * 3 * len(active) - held
+                        for item, held in shortages.items()
+                        if held < self.reorder_level * len(active)
+                    }
+                    if need:
+                        self.request_resupply(team, need)
+    
+    def _dispatch(self, tick):
+        pending = deque()
+        while self.requests:
+            team, items, requested_tick = self.requests.popleft()
+            depots = sorted(
+                (depot for depot in self.depots if depot.stock),
+                key=lambda depot: (depot.location[0] - team.location[0]) ** 2 + (depot.location[1] - team.location[1]) ** 2
+            )
+            remaining = dict(items)
+            for depot in depots:
+                issued = depot.take(remaining)
+                if not issued:
+                    continue
+                for item, quantity in issued.items():
+                    remaining[item] -= quantity
+                    if remaining[item] == 0:
+                        del remaining[item]
+                
+                distance = ((depot.location[0] - team.location[0]) ** 2 + (depot.location[1] - team.location[1]) ** 2) ** 0.5
+                arrival = tick + max(1, int(-(-distance // self.convoy_speed)))
+                self._convoy_seq += 1
+                heapq.heappush(self.convoys, (arrival, self._convoy_seq, team, issued, depot.name))
+                if not remaining:
+                    break
+            
+            if remaining:
+                # Незадоволена частина чекає на наступний такт
+                pending.append((team, remaining, requested_tick))
+        self.requests = pending
+    
+    def _deliver(self, tick):
+        arrived_teams = set()
+        while self.convoys and self.convoys[0][0] <= tick:
+            _, _, team, items, depot_name = heapq.heappop(self.convoys)
+            team = self.simulator.own(team)
+            arrived_teams.add(id(team))
+            if not team.distribute_equipment(items):
+                # Вантаж нікому прийняти: він повертається на склад
+                depot = self.find_depot(depot_name)
+                if depot:
+                    depot.store(items)
+                team.log_event("Колона зі складу {} повернулася з вантажем {}", "логістика", depot_name, items)
+                continue
+            team.log_event("Колона зі складу {} доставила {}", "логістика", depot_name, items)
+            for item, quantity in items.items():
+                self.delivered[item] = self.delivered.get(item, 0) + quantity
+        
+        # Команда може знову подати автозаявку, коли всі її колони прибули
+        if arrived_teams:
+            open_teams = {id(team) for team, _, _ in self.requests}
+            open_teams.update(id(convoy[2]) for convoy in self.convoys)
+            self._requested = {team_id for team_id in self._requested if team_id in open_teams}
+    
+    def status_report(self):
+        report = "\n===== ЛОГІСТИКА =====\n"
+        report += "Склади:\n"
+        for depot in self.depots:
+            report += f"- {depot}: {depot.stock}\n"
+        report += f"Заявок у черзі: {len(self.requests)}\n"
+        report += f"Колон у дорозі: {len(self.convoys)}\n"
+        for arrival, _, team, items, depot_name in sorted(self.convoys)[:10]:
+            report += f"  - {depot_name} -> {team.name}, прибуття на такті {arrival}: {items}\n"
+        report += f"Витрачено: {self.consumed}\n"
+        report += f"Доставлено: {self.delivered}\n"
+        return report
+
+
+class MedicalSystem:
+    """Сортування поранених за тяжкістю та пакетне лікування щотакту"""
+    
+    def __init__(self, simulator, hospital_capacity=5, heal_rate=15, recovery_threshold=60):
+        self.simulator = simulator
+        self.hospital_capacity = hospital_capacity  # пацієнтів за такт без польових медиків
+        self.heal_rate = heal_rate
+        self.recovery_threshold = recovery_threshold
+        self.triage = []  # купа (здоров'я, номер, солдат): найтяжчі першими
+        self.in_triage = set()
+        self.supplied = set()  # id пацієнтів, що вже отримали аптечку
+        self._seq = 0
+        self.treated = 0
+        self.recovered = 0
+    
+    def admit(self, soldier):
+        if id(soldier) in self.in_triage:
+            return False
+        self._seq += 1
+        heapq.heappush(self.triage, (soldier.health, self._seq, soldier))
+        self.in_triage.add(id(soldier))
+        return True
+    
+    def medic_capacity(self):
+        """Польові медики: активні солдати з аптечкою дають місця за навичкою медичні"""
+        medics = []
+        capacity = 0
+        for soldier in self.simulator.soldiers_with_status("Активний"):
+            if soldier.equipment.get("Аптечка", 0) > 0:
+                medics.append(soldier)
+                capacity += soldier.skills.get("медичні", 0)
+        return capacity, medics
+    
+    def snapshot(self):
+        supplied = [soldier for _, _, soldier in self.triage if id(soldier) in self.supplied]
+        return list(self.triage), supplied, self._seq, self.treated, self.recovered
+    
+    def restore(self, state):
+        triage, supplied, self._seq, self.treated, self.recovered = state
+        own = self.simulator.own
+        self.triage = [(health, seq, own(soldier)) for health, seq, soldier in triage]
+        heapq.heapify(self.triage)
+        self.in_triage = {id(soldier) for _, _, soldier in self.triage}
+        self.supplied = {id(own(soldier)) for soldier in supplied}
+    
+    def tick(self, tick):
+        """Один пакетний прохід лікування"""
+        for soldier in list(self.simulator.status_index.groups.get("Поранений", ())):
+            if id(soldier) not in self.in_triage:
+                self.admit(self.simulator.own(soldier))
+        if not self.triage:
+            return
+        
+        medic_slots, medics = self.medic_capacity()
+        slots = self.hospital_capacity + medic_slots
+        kits_used = {}
+        medic_index = 0
+        treated = []
+        
+        while self.triage and len(treated) < slots:
+            _, _, soldier = heapq.heappop(self.triage)
+            if soldier.status != "Поранений":
+                # Статус змінено поза медичною службою
+                self.in_triage.discard(id(soldier))
+                self.supplied.discard(id(soldier))
+                continue
+            
+            # Перше лікування польовим медиком витрачає аптечку
+            if len(treated) >= self.hospital_capacity and id(soldier) not in self.supplied:
+                while medic_index < len(medics) and medics[medic_index].equipment.get("Аптечка", 0) <= kits_used.get(medic_index, 0):
+                    medic_index += 1
+                if medic_index >= len(medics):
+                    self._seq += 1
+                    heapq.heappush(self.triage, (soldier.health, self._seq, soldier))
+                    break
+                kits_used[medic_index] = kits_used.get(medic_index, 0) + 1
+                self.supplied.add(id(soldier))
+            
+            soldier.update_health(self.heal_rate)
+            treated.append(soldier)
+        
+        for index, kits in kits_used.items():
+            self.simulator.own(medics[index]).use_equipment("Аптечка", kits)
+        
+        for soldier in treated:
+            self.treated += 1
+            if soldier.health >= self.recovery_threshold:
+                self.in_triage.discard(id(soldier))
+                self.supplied.discard(id(soldier))
+                self.recovered += 1
+                soldier.update_status("Активний")
+                soldier.log_event("Одужав після лікування, здоров'я {}", "медицина", soldier.health)
+            else:
+                self._seq += 1
+                heapq.heappush(self.triage, (soldier.health, self._seq, soldier))
+    
+    def status_report(self):
+        capacity, medics = self.medic_capacity()
+        report = "\n===== МЕДИЧНА СЛУЖБА =====\n"
+        report += f"Поранених у черзі: {len(self.in_triage)}\n"
+        report += f"Місць лікування за такт: {self.hospital_capacity + capacity} (польових медиків: {len(medics)})\n"
+        report += f"Проведено лікувань: {self.treated}, одужало: {self.recovered}\n"
+        for health, _, soldier in heapq.nsmallest(10, self.triage):
+            report += f"- {soldier.rank} {soldier.name}: здоров'я {health}%\n"
+        return report
+
+
+class EnemyForce:
+    """Ворожий загін: позиції та здоров'я бійців зберігаються масивами для пакетних проходів"""
+    
+    BEHAVIOURS = ("патрулювання", "оборона", "наступ")
+    
+    def __init__(self, name, location, strength, skill=3, weapon="Гвинтівка", effectiveness=7,
+                 behaviour="оборона", waypoints=None, speed=1.0, detection_range=10.0, spread=5.0, rng=None):
+        self.name = name
+        self.location = location
+        self.anchor = location
+        self.skill = skill
+        self.weapon = weapon
+        self.effectiveness = effectiveness
+        self.behaviour = behaviour
+        self.waypoints = list(waypoints or [location])
+        self.waypoint = 0
+        self.speed = speed
+        self.detection_range = detection_range
+        self.detected = set()  # імена виявлених солдатів
+        
+        # Зміщення бійців відносно точки руху загону зберігає його стрій
+        rng = rng or random.Random()
+        if np is not None:
+            generator = np.random.default_rng(rng.getrandbits(64))
+            self.health = np.full(strength, 100.0)
+            self.offset_x = generator.uniform(-spread, spread, strength)
+            self.offset_y = generator.uniform(-spread, spread, strength)
+            self.x = location[0] + self.offset_x
+            self.y = location[1] + self.offset_y
+        else:
+            self.health = array("d", [100.0]) * strength
+            self.offset_x = array("d", (rng.uniform(-spread, spread) for _ in range(strength)))
+            self.offset_y = array("d", (rng.uniform(-spread, spread) for _ in range(strength)))
+            self.x = array("d", (location[0] + dx for dx in self.offset_x))
+            self.y = array("d", (location[1] + dy for dy in self.offset_y))
+    
+    def alive(self):
+        """Номери живих бійців"""
+        if np is not None:
+            return np.flatnonzero(self.health > 0)
+        return [i for i, health in enumerate(self.health) if health > 0]
+    
+    def strength(self):
+        return len(self.alive())
+    
+    def snapshot(self):
+        return (self.location, self.waypoint, set(self.detected),
+                copy.copy(self.health), copy.copy(self.x), copy.copy(self.y))
+    
+    def restore(self, state):
+        self.location, self.waypoint, detected, health, x, y = state
+        self.detected = set(detected)
+        self.health, self.x, self.y = copy.copy(health), copy.copy(x), copy.copy(y)
+    
+    def goal(self):
+        if self.behaviour == "оборона":
+            return self.anchor
+        return self.waypoints[self.waypoint]
+    
+    def step(self):
+        """Пакетний крок усіх живих бійців до точки загону з урахуванням зміщень"""
+        alive = self.alive()
+        if not len(alive):
+            return
+        gx, gy = self.goal()
+        speed = self.speed
+        
+        if np is not None:
+            dx = gx + self.offset_x[alive] - self.x[alive]
+            dy = gy + self.offset_y[alive] - self.y[alive]
+            distance = np.hypot(dx, dy)
+            scale = np.minimum(1.0, speed / np.maximum(distance, 1e-9))
+            self.x[alive] += dx * scale
+            self.y[alive] += dy * scale
+            remaining = float(distance.mean()) - speed
+            self.location = (round(float(self.x[alive].mean()), 1) + 0.0, round(float(self.y[alive].mean()), 1) + 0.0)
+        else:
+            total = sum_x = sum_y = 0.0
+            for i in alive:
+                dx = gx + self.offset_x[i] - self.x[i]
+                dy = gy + self.offset_y[i] - self.y[i]
+                distance = (dx * dx + dy * dy) ** 0.5
+                scale = min(1.0, speed / max(distance, 1e-9))
+                self.x[i] += dx * scale
+                self.y[i] += dy * scale
+                total += distance
+                sum_x += self.x[i]
+                sum_y += self.y[i]
+            remaining = total / len(alive) - speed
+            self.location = (round(sum_x / len(alive), 1) + 0.0, round(sum_y / len(alive), 1) + 0.0)
+        
+        # Загін дійшов до точки маршруту
+        if remaining <= 0 and self.behaviour != "оборона":
+            if self.behaviour == "патрулювання":
+                self.waypoint = (self.waypoint + 1) % len(self.waypoints)
+            elif self.waypoint < len(self.waypoints) - 1:
+                self.waypoint += 1
+    
+    def __str__(self):
+        return f"{self.name} ({self.location}, {self.behaviour}): {self.strength()}/{len(self.health)} бійців, {self.weapon}"
+
+
+class SpatialGrid:
+    """Рівномірна сітка для пошуку точок у радіусі без перебору всіх точок"""
+    
+    OFFSET = 2 ** 20  # зсув номерів клітинок, щоб від'ємні координати давали додатні ключі
+    
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.xs = self.ys = ()
+        self.cells = {}  # ключ клітинки -> номери точок (або межі зрізу впорядкованих номерів)
+        self.order = None
+    
+    def _key(self, cx, cy):
+        return (cx + self.OFFSET) * (2 * self.OFFSET) + cy + self.OFFSET
+    
+    def build(self, xs, ys):
+        self.xs, self.ys = xs, ys
+        size = self.cell_size
+        if np is not None:
+            keys = self._key(np.floor(xs / size).astype(np.int64), np.floor(ys / size).astype(np.int64))
+            self.order = np.argsort(keys, kind="stable")
+            unique, starts = np.unique(keys[self.order], return_index=True)
+            ends = np.append(starts[1:], len(keys))
+            self.cells = dict(zip(unique.tolist(), zip(starts.tolist(), ends.tolist())))
+        else:
+            self.cells = {}
+            for i, (x, y) in enumerate(zip(xs, ys)):
+                self.cells.setdefault(self._key(int(x // size), int(y // size)), []).append(i)
+        return self
+    
+    def query(self, x, y, radius):
+        """Номери точок на відстані не більше radius від (x, y)"""
+        size = self.cell_size
+        span = range(int((x - radius) // size), int((x + radius) // size) + 1)
+        rows = range(int((y - radius) // size), int((y + radius) // size) + 1)
+        keys = [self._key(cx, cy) for cx in span for cy in rows]
+        
+        if np is not None:
+            slices = [self.order[start:end] for start, end in (self.cells[key] for key in keys if key in self.cells)]
+            if not slices:
+                return slices
+            candidates = np.concatenate(slices)
+            near = (self.xs[candidates] - x) ** 2 + (self.ys[candidates] - y) ** 2 <= radius * radius
+            return candidates[near]
+        
+        result = []
+        for key in keys:
+            for i in self.cells.get(key, ()):
+                if (self.xs[i] - x) ** 2 + (self.ys[i] - y) ** 2 <= radius * radius:
+                    result.append(i)
+        return result
+
+
+class EngagementSystem:
+    """Бої команд з ворожими загонами: пострільна ймовірнісна модель, один пакетний прохід щотакту.
+    
+    Кожен живий боєць стріляє раз на такт по випадковій живій цілі свого бою.
+    Ймовірність влучання залежить від навички бойові та ефективності зброї,
+    пошкодження - від ефективності зброї. Обидві сторони стріляють одночасно.
+    """
+    
+    WEAPONS = ("Гвинтівка", "Пістолет", "Граната")
+    
+    def __init__(self, simulator, hit_scale=0.05, max_hit=0.9, damage_scale=3.0):
+        self.simulator = simulator
+        self.hit_scale = hit_scale
+        self.max_hit = max_hit
+        self.damage_scale = damage_scale
+        self.forces = {}
+        self.engagements = {}  # назва загону -> список команд у бою з ним
+        self.enemy_losses = 0
+        self.friendly_casualties = 0
+        self.shots = 0
+    
+    def add_force(self, name, location, strength, skill=3, weapon="Гвинтівка", behaviour="оборона", waypoints=None,
+                  speed=1.0, detection_range=10.0):
+        info = self.simulator.equipment_database.get(weapon, {})
+        force = EnemyForce(
+            name, location, strength, skill, weapon, info.get("ефективність", 1), behaviour, waypoints,
+            speed, detection_range, rng=self.simulator.rng.stream("ворог", name)
+        )
+        self.forces[name] = force
+        self.simulator.log_event("Ворожий загін {}: {} бійців біля {}, {}", "бій", name, strength, location, behaviour)
+        return force
+    
+    def snapshot(self):
+        return (
+            [(force, force.snapshot()) for force in self.forces.values()],
+            {force_name: list(teams) for force_name, teams in self.engagements.items()},
+            self.enemy_losses, self.friendly_casualties, self.shots
+        )
+    
+    def restore(self, state):
+        forces, engagements, self.enemy_losses, self.friendly_casualties, self.shots = state
+        self.forces = {}
+        for force, force_state in forces:
+            force.restore(force_state)
+            self.forces[force.name] = force
+        own = self.simulator.own
+        self.engagements = {force_name: [own(team) for team in teams] for force_name, teams in engagements.items()}
+    
+    def engage(self, team, force_name):
+        force = self.forces.get(force_name)
+        if force is None or not force.strength():
+            return False
+        team = self.simulator.own(team)
+        teams = self.engagements.setdefault(force_name, [])
+        if team not in teams:
+            teams.append(team)
+            team.log_event("Вступила в бій із загоном {}", "бій", force_name)
+        return True
+    
+    def weapon_effectiveness(self, soldier):
+        """Ефективність найкращої зброї солдата; без зброї - 1"""
+        database = soldier.equipment_database
+        return max(
+            (database[item]["ефективність"] for item in self.WEAPONS if soldier.equipment.get(item, 0) > 0 and item in database),
+            default=1
+        )
+    
+    def hit_probability(self, skill, effectiveness):
+        return min(self.max_hit, self.hit_scale * (1 + skill) * effectiveness / 10)
+    
+    def _battles(self):
+        """Поточні бої: (загін, живі вороги, активні солдати); завершені бої знімаються"""
+        battles = []
+        for force_name in list(self.engagements):
+            force = self.forces[force_name]
+            alive = force.alive()
+            soldiers = []
+            seen = set()
+            for team in self.engagements[force_name]:
+                for member in team.members_with_status("Активний"):
+                    if id(member) not in seen:
+                        seen.add(id(member))
+                        soldiers.append(member)
+            
+            if not len(alive):
+                self.simulator.log_event("Ворожий загін {} знищено", "бій", force_name)
+                for team in self.engagements.pop(force_name):
+                    team.log_event("Бій із загоном {} завершено перемогою", "бій", force_name)
+            elif not soldiers:
+                for team in self.engagements.pop(force_name):
+                    team.log_event("Вийшла з бою із загоном {}: немає боєздатних", "бій", force_name)
+            else:
+                battles.append((force, alive, soldiers))
+        return battles
+    
+    def _volley_numpy(self, generator, skills, effectiveness, battle_ids, target_counts, target_offsets):
+        """Сумарні пошкодження кожної цілі від залпу всіх стрільців"""
+        probability = np.minimum(self.max_hit, self.hit_scale * (1 + skills) * effectiveness / 10)
+        hits = generator.random(len(skills)) < probability
+        counts = target_counts[battle_ids]
+        targets = target_offsets[battle_ids] + (generator.random(len(skills)) * counts).astype(np.int64)
+        return np.bincount(targets[hits], weights=self.damage_scale * effectiveness[hits], minlength=int(target_counts.sum()))
+    
+    def _volley_python(self, rng, shooters, target_counts, target_offsets):
+        damage = [0.0] * sum(target_counts)
+        for skill, effectiveness, battle in shooters:
+            hit = rng.random() < self.hit_probability(skill, effectiveness)
+            target = target_offsets[battle] + int(rng.random() * target_counts[battle])
+            if hit:
+                damage[target] += self.damage_scale * effectiveness
+        return damage
+    
+    def _move_forces(self):
+        """Пакетне оновлення позицій загонів, що не ведуть бій"""
+        for force in self.forces.values():
+            if force.name not in self.engagements:
+                force.step()
+    
+    def _detect(self):
+        """Виявлення активних солдатів через сітку позицій усіх живих ворогів; виявлені команди вступають у бій"""
+        forces = list(self.forces.values())
+        alive = [force.alive() for force in forces]
+        if not forces or not any(len(indices) for indices in alive):
+            return 0
+        soldiers = self.simulator.status_index.groups.get("Активний", ())
+        if not soldiers:
+            return 0
+        
+        ranges = [force.detection_range for force in forces]
+        if np is not None:
+            xs = np.concatenate([force.x[indices] for force, indices in zip(forces, alive)])
+            ys = np.concatenate([force.y[indices] for force, indices in zip(forces, alive)])
+            owners = np.repeat(np.arange(len(forces)), [len(indices) for indices in alive])
+        else:
+            xs = array("d", (force.x[i] for force, indices in zip(forces, alive) for i in indices))
+            ys = array("d", (force.y[i] for force, indices in zip(forces, alive) for i in indices))
+            owners = [f for f, indices in enumerate(alive) for _ in indices]
+        grid = SpatialGrid(max(ranges)).build(xs, ys)
+        
+        teams_of = {}
+        for team in self.simulator.teams:
+            for member in team.members:
+                teams_of.setdefault(id(member), []).append(team)
+        
+        detections = 0
+        uniform_range = min(ranges) == max(ranges)
+        for soldier in list(soldiers):
+            x, y = soldier.location
+            near = grid.query(x, y, max(ranges))
+            if not len(near):
+                continue
+            if uniform_range:
+                spotting = set(owners[near].tolist()) if np is not None else {owners[i] for i in near}
+            else:
+                spotting = {owners[i] for i in near if (xs[i] - x) ** 2 + (ys[i] - y) ** 2 <= ranges[owners[i]] ** 2}
+            for f in spotting:
+                force = forces[f]
+                if soldier.name not in force.detected:
+                    force.detected.add(soldier.name)
+                    detections += 1
+                    self.simulator.log_event("Загін {} виявив {} {} біля {}", "бій", force.name, soldier.rank, soldier.name, soldier.location)
+                for team in teams_of.get(id(soldier), ()):
+                    self.engage(team, force.name)
+        return detections
+    
+    def tick(self, tick):
+        """Один пакетний прохід: рух загонів, виявлення і всі бої"""
+        self._move_forces()
+        self._detect()
+        battles = self._battles()
+        if not battles:
+            return
+        rng = self.simulator.rng.stream("бій")
+        
+        enemy_counts = [len(alive) for _, alive, _ in battles]
+        friendly_counts = [len(soldiers) for _, _, soldiers in battles]
+        friendly_skills = [soldier.skills.get("бойові", 0) for _, _, soldiers in battles for soldier in soldiers]
+        friendly_effectiveness = [self.weapon_effectiveness(soldier) for _, _, soldiers in battles for soldier in soldiers]
+        
+        if np is not None:
+            generator = np.random.default_rng(rng.getrandbits(64))
+            enemy_counts = np.array(enemy_counts)
+            friendly_counts = np.array(friendly_counts)
+            enemy_offsets = np.concatenate(([0], np.cumsum(enemy_counts)[:-1]))
+            friendly_offsets = np.concatenate(([0], np.cumsum(friendly_counts)[:-1]))
+            friendly_battles = np.repeat(np.arange(len(battles)), friendly_counts)
+            enemy_battles = np.repeat(np.arange(len(battles)), enemy_counts)
+            
+            # Обидві сторони стріляють за станом на початок такту
+            enemy_damage = self._volley_numpy(
+                generator, np.array(friendly_skills, dtype=float), np.array(friendly_effectiveness, dtype=float),
+                friendly_battles, enemy_counts, enemy_offsets
+            )
+            friendly_damage = self._volley_numpy(
+                generator,
+                np.repeat([float(force.skill) for force, _, _ in battles], enemy_counts),
+                np.repeat([float(force.effectiveness) for force, _, _ in battles], enemy_counts),
+                enemy_battles, friendly_counts, friendly_offsets
+            )
+            for b, (force, alive, _) in enumerate(battles):
+                start = enemy_offsets[b]
+                force.health[alive] -= enemy_damage[start:start + enemy_counts[b]]
+                self.enemy_losses += int(np.count_nonzero(force.health[alive] <= 0))
+        else:
+            enemy_offsets = [sum(enemy_counts[:b]) for b in range(len(battles))]
+            friendly_offsets = [sum(friendly_counts[:b]) for b in range(len(battles))]
+            friendly_battles = [b for b, count in enumerate(friendly_counts) for _ in range(count)]
+            enemy_damage = self._volley_python(
+                rng, list(zip(friendly_skills, friendly_effectiveness, friendly_battles)), enemy_counts, enemy_offsets
+            )
+            enemy_shooters = [(force.skill, force.effectiveness, b) for b, (force, alive, _) in enumerate(battles) for _ in alive]
+            friendly_damage = self._volley_python(rng, enemy_shooters, friendly_counts, friendly_offsets)
+            for b, (force, alive, _) in enumerate(battles):
+                for position, index in enumerate(alive):
+                    force.health[index] -= enemy_damage[enemy_offsets[b] + position]
+                    if force.health[index] <= 0:
+                        self.enemy_losses += 1
+        
+        self.shots += len(friendly_skills) + int(sum(enemy_counts))
+        soldiers = [soldier for _, _, battle_soldiers in battles for soldier in battle_soldiers]
+        for soldier, damage in zip(soldiers, friendly_damage):
+            if damage > 0:
+                soldier.update_health(-int(round(damage)))
+                if soldier.status == "Поранений":
+                    self.friendly_casualties += 1
+    
+    def status_report(self):
+        report = "\n===== БОЙОВА ОБСТАНОВКА =====\n"
+        report += f"Розрахунок: {'NumPy' if np is not None else 'чистий Python'}\n"
+        report += f"Ворожих втрат: {self.enemy_losses}, наших поранених: {self.friendly_casualties}, пострілів: {self.shots}\n"
+        for force in self.forces.values():
+            teams = self.engagements.get(force.name, [])
+            engaged = f" - у бою з: {', '.join(team.name for team in teams)}" if teams else ""
+            report += f"- {force}{engaged}\n"
+        return report
+
+
+class VisibilityLayer:
+    """Видимість однієї сторони: рядки сітки як упаковані бітові маски"""
+    
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.visible = [0] * height
+        self.discovered = [0] * height
+        self.row_masks = [{} for _ in range(height)]  # рядок -> {спостерігач: маска}
+        self.observers = {}  # спостерігач -> (ключ розміщення, рядки)
+        self.dirty = set()
+    
+    def place(self, observer, key, footprint):
+        """Розмістити або перемістити спостерігача; footprint - список (рядок, маска)"""
+        self.remove(observer)
+        rows = []
+        for row, mask in footprint:
+            self.row_masks[row][observer] = mask
+            self.dirty.add(row)
+            rows.append(row)
+        self.observers[observer] = (key, rows)
+    
+    def remove(self, observer):
+        placed = self.observers.pop(observer, None)
+        if placed:
+            for row in placed[1]:
+                del self.row_masks[row][observer]
+                self.dirty.add(row)
+    
+    def key(self, observer):
+        placed = self.observers.get(observer)
+        return placed[0] if placed else None
+    
+    def refresh(self):
+        """Перерахувати лише рядки, яких торкнулися переміщення"""
+        for row in self.dirty:
+            mask = 0
+            for observer_mask in self.row_masks[row].values():
+                mask |= observer_mask
+            self.visible[row] = mask
+            self.discovered[row] |= mask
+        refreshed = len(self.dirty)
+        self.dirty.clear()
+        return refreshed
+    
+    def count(self, rows):
+        return sum(bin(row).count("1") for row in rows)
+
+
+class VisibilitySystem:
+    """Туман війни: спостережувані та розвідані клітинки для кожної сторони.
+    
+    Дальність огляду солдата залежить від навички розвідка та оптики (Бінокль,
+    Нічний приціл). Ворожі загони спостерігають зі свого центру на дальність
+    виявлення. Оновлюються лише спостерігачі, що перемістилися або змінили дальність.
+    """
+    
+    SIDES = ("свої", "противник")
+    
+    def __init__(self, simulator, origin=(-500, -500), size=(1000, 1000), cell_size=5):
+        self.simulator = simulator
+        self.origin = origin
+        self.cell_size = cell_size
+        self.width = int(size[0] // cell_size)
+        self.height = int(size[1] // cell_size)
+        self.layers = {side: VisibilityLayer(self.width, self.height) for side in self.SIDES}
+        self._disks = {}  # радіус у клітинках -> [(зсув рядка, напівширина)]
+        self.updates = 0
+    
+    def cell(self, location):
+        cx = int((location[0] - self.origin[0]) // self.cell_size)
+        cy = int((location[1] - self.origin[1]) // self.cell_size)
+        return cx, cy
+    
+    def _disk(self, radius):
+        spans = self._disks.get(radius)
+        if spans is None:
+            spans = [(dy, int((radius * radius - dy * dy) ** 0.5)) for dy in range(-radius, radius + 1)]
+            self._disks[radius] = spans
+        return spans
+    
+    def footprint(self, location, view_range):
+        """Рядки та бітові маски клітинок у колі огляду"""
+        cx, cy = self.cell(location)
+        result = []
+        for dy, half in self._disk(int(view_range // self.cell_size)):
+            row = cy + dy
+            x0, x1 = max(0, cx - half), min(self.width - 1, cx + half)
+            if 0 <= row < self.height and x0 <= x1:
+                result.append((row, ((1 << (x1 - x0 + 1)) - 1) << x0))
+        return result
+    
+    def _update(self, layer, observers):
+        """observers: {спостерігач: (позиція, дальність)}; решта спостерігачів шару знімаються"""
+        for observer in [observer for observer in layer.observers if observer not in observers]:
+            layer.remove(observer)
+        for observer, key in observers.items():
+            if layer.key(observer) != key:
+                layer.place(observer, key, self.footprint(*key))
+                self.updates += 1
+        return layer.refresh()
+    
+    def snapshot(self):
+        return {side: list(layer.discovered) for side, layer in self.layers.items()}, self.updates
+    
+    def restore(self, state):
+        # Поточна видимість похідна від позицій: шари перебудовуються, розвідане відновлюється зі знімка
+        discovered, updates = state
+        self.layers = {side: VisibilityLayer(self.width, self.height) for side in self.SIDES}
+        self.tick(None)
+        for side, rows in discovered.items():
+            self.layers[side].discovered = list(rows)
+        self.updates = updates
+    
+    def tick(self, tick):
+        """Інкрементне оновлення видимості обох сторін"""
+        soldiers = self.simulator.status_index.groups.get("Активний", ())
+        self._update(self.layers["свої"], {
+            soldier: (soldier.location, soldier.metrics()["дальність огляду"]) for soldier in soldiers
+        })
+        self._update(self.layers["противник"], {
+            force.name: (force.location, force.detection_range)
+            for force in self.simulator.engagement.forces.values() if force.strength()
+        })
+    
+    def is_visible(self, side, location):
+        cx, cy = self.cell(location)
+        if not (0 <= cx < self.width and 0 <= cy < self.height):
+            return False
+        return bool(self.layers[side].visible[cy] >> cx & 1)
+    
+    def is_discovered(self, side, location):
+        cx, cy = self.cell(location)
+        if not (0 <= cx < self.width and 0 <= cy < self.height):
+            return False
+        return bool(self.layers[side].discovered[cy] >> cx & 1)
+    
+    def visible_forces(self):
+        """Ворожі загони, чиї позиції зараз у полі зору своїх"""
+        return [force for force in self.simulator.engagement.forces.values() if force.strength() and self.is_visible("свої", force.location)]
+    
+    def status_report(self):
+        total = self.width * self.height
+        report = "\n===== ТУМАН ВІЙНИ =====\n"
+        report += f"Сітка: {self.width}x{self.height} клітинок по {self.cell_size} од., оновлень спостерігачів: {self.updates}\n"
+        for side, layer in self.layers.items():
+            visible = layer.count(layer.visible)
+            discovered = layer.count(layer.discovered)
+            report += f"- {side}: спостерігачів {len(layer.observers)}, видно {visible} ({visible * 100 / total:.1f}%), розвідано {discovered} ({discovered * 100 / total:.1f}%)\n"
+        forces = self.visible_forces()
+        report += "Ворожі загони в полі зору: " + (", ".join(f"{force.name} {force.location}" for force in forces) if forces else "немає") + "\n"
+        return report
+
+
+class RadioNetwork:
+    """Групи радіозв'язку: інкрементний union-find над солдатами з рацією.
+    
+    Нові зв'язки лише об'єднують множини. Компонента перебудовується з
+    таблиці суміжності тільки тоді, коли учасник втратив сусіда або вибув.
+    """
+    
+    def __init__(self, simulator, radio_range=30.0, voice_range=5.0, item="Рація"):
+        self.simulator = simulator
+        self.radio_range = radio_range
+        self.voice_range = voice_range  # зв'язок голосом без рації
+        self.item = item
+        self.positions = {}  # солдат -> позиція на момент останнього оновлення
+        self.cells = {}  # клітинка -> множина солдатів
+        self.adjacency = {}  # солдат -> сусіди в межах дальності рації
+        self.parent = {}
+        self.rank = {}
+        self.members = {}  # корінь -> множина учасників компоненти
+        self.rebuilt = 0
+    
+    def _cell(self, location):
+        return int(location[0] // self.radio_range), int(location[1] // self.radio_range)
+    
+    def _neighbours(self, soldier, location):
+        cx, cy = self._cell(location)
+        limit = self.radio_range * self.radio_range
+        found = set()
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in self.cells.get((cx + dx, cy + dy), ()):
+                    position = self.positions[other]
+                    if other is not soldier and (position[0] - location[0]) ** 2 + (position[1] - location[1]) ** 2 <= limit:
+                        found.add(other)
+        return found
+    
+    def find(self, soldier):
+        root = soldier
+        while self.parent[root] is not root:
+            root = self.parent[root]
+        while self.parent[soldier] is not root:
+            self.parent[soldier], soldier = root, self.parent[soldier]
+        return root
+    
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first is second:
+            return first
+        if self.rank[first] < self.rank[second]:
+            first, second = second, first
+        self.parent[second] = first
+        if self.rank[first] == self.rank[second]:
+            self.rank[first] += 1
+        self.members[first] |= self.members.pop(second)
+        return first
+    
+    def _make_set(self, soldier):
+        self.parent[soldier] = soldier
+        self.rank[soldier] = 0
+        self.members[soldier] = {soldier}
+    
+    def _place(self, soldier, location):
+        old = self.positions.get(soldier)
+        if old is not None:
+            self.cells[self._cell(old)].discard(soldier)
+        self.positions[soldier] = location
+        self.cells.setdefault(self._cell(location), set()).add(soldier)
+    
+    def snapshot(self):
+        return self.rebuilt
+    
+    def restore(self, state):
+        # Групи зв'язку похідні від позицій носіїв рацій: вони будуються заново
+        self.positions = {}
+        self.cells = {}
+        self.adjacency = {}
+        self.parent = {}
+        self.rank = {}
+        self.members = {}
+        self.tick(None)
+        self.rebuilt = state
+    
+    def tick(self, tick):
+        """Оновити лише тих, хто перемістився, отримав або втратив рацію"""
+        carriers = {
+            soldier: soldier.location for soldier in self.simulator.status_index.groups.get("Активний", ())
+            if soldier.equipment.get(self.item, 0) > 0
+        }
+        removed = [soldier for soldier in self.positions if soldier not in carriers]
+        moved = [soldier for soldier, location in carriers.items() if soldier in self.positions and self.positions[soldier] != location]
+        added = [soldier for soldier in carriers if soldier not in self.positions]
+        if not (removed or moved or added):
+            return 0
+        
+        dirty_roots = set()
+        gained = []
+        for soldier in removed:
+            dirty_roots.add(self.find(soldier))
+            for neighbour in self.adjacency.pop(soldier):
+                self.adjacency[neighbour].discard(soldier)
+            self.cells[self._cell(self.positions.pop(soldier))].discard(soldier)
+        
+        for soldier in moved:
+            location = carriers[soldier]
+            self._place(soldier, location)
+            old, new = self.adjacency[soldier], self._neighbours(soldier, location)
+            for neighbour in old - new:
+                self.adjacency[neighbour].discard(soldier)
+            for neighbour in new - old:
+                self.adjacency[neighbour].add(soldier)
+            self.adjacency[soldier] = new
+            if old - new:
+                dirty_roots.add(self.find(soldier))
+            else:
+                gained.append((soldier, new - old))
+        
+        for soldier in added:
+            self._place(soldier, carriers[soldier])
+            neighbours = self._neighbours(soldier, carriers[soldier])
+            for neighbour in neighbours:
+                self.adjacency[neighbour].add(soldier)
+            self.adjacency[soldier] = neighbours
+            self._make_set(soldier)
+            gained.append((soldier, neighbours))
+        
+        # Компоненти з розірваними зв'язками перебудовуються з суміжності
+        affected = set()
+        for root in dirty_roots:
+            affected |= self.members.pop(root)
+        for soldier in removed:
+            affected.discard(soldier)
+            del self.parent[soldier], self.rank[soldier]
+        for soldier in affected:
+            self._make_set(soldier)
+        for soldier in affected:
+            for neighbour in self.adjacency[soldier]:
+                self.union(soldier, neighbour)
+        self.rebuilt += len(affected)
+        
+        # Сусід міг відійти пізніше в цьому ж такті: об'єднуються лише досі суміжні
+        for soldier, neighbours in gained:
+            for neighbour in neighbours & self.adjacency[soldier]:
+                self.union(soldier, neighbour)
+        return len(removed) + len(moved) + len(added)
+    
+    def group(self, soldier):
+        """Учасники групи зв'язку солдата"""
+        if soldier in self.parent:
+            return self.members[self.find(soldier)]
+        return {soldier}
+    
+    def connected(self, first, second):
+        if first is second:
+            return True
+        if first in self.parent and second in self.parent and self.find(first) is self.find(second):
+            return True
+        return first._calculate_distance(first.location, second.location) <= self.voice_range
+    
+    def groups(self):
+        return sorted(self.members.values(), key=len, reverse=True)
+    
+    def status_report(self):
+        groups = self.groups()
+        report = "\n===== РАДІОЗВ'ЯЗОК =====\n"
+        report += f"Дальність рації: {self.radio_range}, голосом: {self.voice_range}\n"
+        report += f"Солдатів з рацією: {len(self.parent)}, груп зв'язку: {len(groups)}\n"
+        for members in groups[:10]:
+            names = ", ".join(sorted(soldier.name for soldier in members)[:8])
+            more = f" та ще {len(members) - 8}" if len(members) > 8 else ""
+            report += f"- {len(members)}: {names}{more}\n"
+        return report
+
+
+class GeofenceSystem:
+    """Цілі із зонами: усі зони перевіряються одним пакетним проходом по солдатах щотакту.
+    
+    Зони готових цілей активних місій розкладаються по клітинках сітки,
+    тож кожен солдат перевіряє лише зони своєї клітинки.
+    """
+    
+    CONDITIONS = ("прибуття", "утримання")
+    
+    def __init__(self, simulator, cell_size=20.0):
+        self.simulator = simulator
+        self.cell_size = cell_size
+        self.held = {}  # (id місії, індекс цілі) -> тактів утримання поспіль
+        self.triggered = 0
+    
+    @staticmethod
+    def bounds(area):
+        if "bounds" in area:
+            return area["bounds"]
+        (x, y), radius = area["center"], area["radius"]
+        return x - radius, y - radius, x + radius, y + radius
+    
+    @staticmethod
+    def contains(area, location):
+        x, y = location
+        if "bounds" in area:
+            x0, y0, x1, y1 = area["bounds"]
+            return x0 <= x <= x1 and y0 <= y <= y1
+        (cx, cy), radius = area["center"], area["radius"]
+        return (x - cx) ** 2 + (y - cy) ** 2 <= radius * radius
+    
+    def _fences(self):
+        fences = []
+        for mission in self.simulator.missions:
+            if mission.status != "Активна":
+                continue
+            for index in sorted(mission.ready_objectives):
+                objective = mission.objectives[index]
+                if objective.get("area"):
+                    fences.append((mission, index, objective))
+        return fences
+    
+    def snapshot(self):
+        missions = {id(mission): mission for mission in self.simulator.missions}
+        held = [(missions[mission_id], index, count) for (mission_id, index), count in self.held.items() if mission_id in missions]
+        return held, self.triggered
+    
+    def restore(self, state):
+        held, self.triggered = state
+        self.held = {(id(self.simulator.own(mission)), index): count for mission, index, count in held}
+    
+    def tick(self, tick):
+        """Підрахувати солдатів місій у зонах і виконати цілі, умови яких справдилися"""
+        fences = self._fences()
+        if not fences:
+            self.held.clear()
+            return 0
+        
+        size = self.cell_size
+        grid = {}
+        for f, (_, _, objective) in enumerate(fences):
+            x0, y0, x1, y1 = self.bounds(objective["area"])
+            for cx in range(int(x0 // size), int(x1 // size) + 1):
+                for cy in range(int(y0 // size), int(y1 // size) + 1):
+                    grid.setdefault((cx, cy), []).append(f)
+        
+        # Солдат зараховується лише до зон місій, на які призначено його команду
+        missions_of = {}
+        for mission in {id(mission): mission for mission, _, _ in fences}.values():
+            for team in mission.teams:
+                for member in team.members_with_status("Активний"):
+                    missions_of.setdefault(member, set()).add(id(mission))
+        
+        counts = [0] * len(fences)
+        for soldier, missions in missions_of.items():
+            x, y = soldier.location
+            for f in grid.get((int(x // size), int(y // size)), ()):
+                mission, _, objective = fences[f]
+                if id(mission) in missions and self.contains(objective["area"], soldier.location):
+                    counts[f] += 1
+        
+        completed = 0
+        active_keys = set()
+        for (mission, index, objective), count in zip(fences, counts):
+            key = (id(mission), index)
+            active_keys.add(key)
+            if count < objective["min_soldiers"]:
+                self.held.pop(key, None)
+                continue
+            held = self.held[key] = self.held.get(key, 0) + 1
+            if objective["condition"] == "утримання" and held < objective["hold_ticks"]:
+                continue
+            if self.simulator.own(mission).complete_objective(index):
+                self.held.pop(key, None)
+                completed += 1
+        for key in [key for key in self.held if key not in active_keys]:
+            del self.held[key]
+        self.triggered += completed
+        return completed
+
+
+class RingSeries:
+    """Кільцевий буфер (такт, значення) на компактних масивах"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ticks = array("q", [0] * capacity)
+        self.values = array("d", [0.0] * capacity)
+        self.start = 0
+        self.count = 0
+    
+    def append(self, tick, value):
+        index = (self.start + self.count) % self.capacity
+        self.ticks[index] = tick
+        self.values[index] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+    
+    def oldest_tick(self):
+        return self.ticks[self.start] if self.count else None
+    
+    def window(self, start_tick=None, end_tick=None):
+        """Точки з тактами в межах [start_tick, end_tick] (двійковий пошук по кільцю)"""
+        def tick_at(position):
+            return self.ticks[(self.start + position) % self.capacity]
+        
+        lo, hi = 0, self.count
+        if start_tick is not None:
+            while lo < hi:
+                middle = (lo + hi) // 2
+                if tick_at(middle) < start_tick:
+                    lo = middle + 1
+                else:
+                    hi = middle
+        first = lo
+        lo, hi = first, self.count
+        if end_tick is None:
+            lo = self.count
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if tick_at(middle) <= end_tick:
+                lo = middle + 1
+            else:
+                hi = middle
+        return [
+            (self.ticks[(self.start + position) % self.capacity], self.values[(self.start + position) % self.capacity])
+            for position in range(first, lo)
+        ]
+
+
+class MetricSeries:
+    """Ряд показника з кількома рівнями деталізації для довгих прогонів"""
+    
+    def __init__(self, capacity=1000, factors=(1, 10, 100)):
+        self.factors = factors
+        self.levels = [RingSeries(capacity) for _ in factors]
+        self._buckets = [[0.0, 0] for _ in factors]  # сума та кількість для усереднення
+    
+    def append(self, tick, value):
+        self.levels[0].append(tick, value)
+        for level in range(1, len(self.factors)):
+            bucket = self._buckets[level]
+            bucket[0] += value
+            bucket[1] += 1
+            if bucket[1] == self.factors[level]:
+                self.levels[level].append(tick, bucket[0] / bucket[1])
+                bucket[0], bucket[1] = 0.0, 0
+    
+    def window(self, start_tick=None, end_tick=None):
+        """Точки з найдетальнішого рівня, що ще містить start_tick"""
+        levels = [level for level in self.levels if level.count]
+        if not levels:
+            return []
+        if start_tick is not None:
+            for level in levels:
+                if level.oldest_tick() <= start_tick:
+                    return level.window(start_tick, end_tick)
+        # Потрібна історія старша за всі рівні: беремо рівень з найдавнішими даними
+        return min(levels, key=lambda level: level.oldest_tick()).window(start_tick, end_tick)
+
+
+class MetricsRecorder:
+    """Щотактний запис датчиків і лічильників стану симуляції"""
+    
+    def __init__(self, simulator, capacity=1000, factors=(1, 10, 100), interval=1):
+        self.simulator = simulator
+        self.capacity = capacity
+        self.factors = factors
+        self.interval = interval
+        self.gauges = {}  # назва -> функція поточного значення
+        self.counters = {}  # назва -> функція накопиченого значення; записується приріст
+        self._last_counts = {}
+        self.series = {}
+        self._add_default_metrics()
+    
+    def _add_default_metrics(self):
+        simulator = self.simulator
+        self.add_gauge("активні", lambda: simulator.status_index.count("Активний"))
+        self.add_gauge("поранені", lambda: simulator.status_index.count("Поранений"))
+        self.add_gauge("середній успіх місій", lambda: (
+            sum(mission.success_rate for mission in simulator.missions) / len(simulator.missions) if simulator.missions else 0
+        ))
+        self.add_gauge("спорядження команд", lambda: sum(
+            sum(team.rollup()["спорядження"].values()) for team in simulator.teams
+        ))
+        self.add_gauge("активні місії", lambda: sum(1 for mission in simulator.missions if mission.status == "Активна"))
+        self.add_counter("витрачено спорядження", lambda: sum(simulator.logistics.consumed.values()))
+        self.add_counter("доставлено спорядження", lambda: sum(simulator.logistics.delivered.values()))
+        self.add_counter("лікування", lambda: simulator.medical.treated)
+        self.add_counter("ворожі втрати", lambda: simulator.engagement.enemy_losses)
+    
+    def add_gauge(self, name, function):
+        self.gauges[name] = function
+        self.series[name] = MetricSeries(self.capacity, self.factors)
+    
+    def add_counter(self, name, function):
+        self.counters[name] = function
+        self._last_counts[name] = function()
+        self.series[name] = MetricSeries(self.capacity, self.factors)
+    
+    def remove(self, name):
+        self.gauges.pop(name, None)
+        self.counters.pop(name, None)
+        self._last_counts.pop(name, None)
+        return self.series.pop(name, None) is not None
+    
+    def tick(self, tick):
+        if tick % self.interval:
+            return
+        for name, function in self.gauges.items():
+            self.series[name].append(tick, float(function()))
+        for name, function in self.counters.items():
+            value = function()
+            self.series[name].append(tick, float(value - self._last_counts[name]))
+            self._last_counts[name] = value
+    
+    def snapshot(self):
+        return dict(self._last_counts)
+    
+    def restore(self, state):
+        # Історія рядів описує фактичний прогін і не перемотується; відновлюються бази лічильників
+        self._last_counts.update(state)
+    
+    def window(self, name, start_tick=None, end_tick=None):
+        series = self.series.get(name)
+        return series.window(start_tick, end_tick) if series else []
+    
+    def export_csv(self, path, start_tick=None, end_tick=None):
+        """Записати ряди у довгому форматі: показник, такт, значення"""
+        with open(path, "w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["показник", "такт", "значення"])
+            for name in self.series:
+                for tick, value in self.window(name, start_tick, end_tick):
+                    writer.writerow([name, tick, value])
+        return path
+
+
+class Profiler:
+    """Вмикане за потреби вимірювання часу та пам'яті основних операцій.
+    
+    Коли профілювання вимкнене, методи класів не обгорнуті, тож накладних
+    витрат немає зовсім.
+    """
+    
+    TARGETS = {
+        "MilitarySimulator": [
+            "tick", "simulate_mission_progress", "log_event", "global_status_report", "capture_state",
+            "optimize_assignments", "allocate_equipment", "create_soldier", "find_soldier", "find_team", "find_mission"
+        ],
+        "Team": [
+            "team_status", "broadcast_message", "direct_message", "move_team", "distribute_equipment",
+            "equipment_report", "team_skill_report", "log_event", "metrics", "rollup"
+        ],
+        "Mission": ["calculate_success_probability", "complete_objective", "mission_report", "add_objective", "log_event"],
+        "LogisticsSystem": ["tick"],
+        "MedicalSystem": ["tick"],
+        "MetricsRecorder": ["tick"],
+        "ReplayRecorder": ["capture"],
+        "MessageBus": ["dispatch"]
+    }
+    
+    def __init__(self, max_samples=2000, allocation_sample_rate=10):
+        self.enabled = False
+        self.track_allocations = False
+        self.max_samples = max_samples
+        self.allocation_sample_rate = allocation_sample_rate
+        self.stats = {}
+        self._originals = {}
+    
+    def enable(self, track_allocations=False):
+        if self.enabled:
+            return False
+        self.enabled = True
+        self.track_allocations = track_allocations
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        
+        for class_name, method_names in self.TARGETS.items():
+            cls = globals()[class_name]
+            for method_name in method_names:
+                original = cls.__dict__.get(method_name)
+                if original is None:
+                    continue
+                self._originals[(cls, method_name)] = original
+                setattr(cls, method_name, self._wrap(f"{class_name}.{method_name}", original))
+        return True
+    
+    def disable(self):
+        if not self.enabled:
+            return False
+        for (cls, method_name), original in self._originals.items():
+            setattr(cls, method_name, original)
+        self._originals = {}
+        if self.track_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+        return True
+    
+    def reset(self):
+        # Очищення на місці: обгортки вже тримають посилання на цей словник
+        self.stats.clear()
+    
+    def _wrap(self, name, function):
+        stats = self.stats
+        profiler = self
+        
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            record = stats.get(name)
+            if record is None:
+                record = stats[name] = {"calls": 0, "total": 0.0, "samples": deque(maxlen=profiler.max_samples),
+                                        "allocated": 0, "allocation_samples": 0}
+            record["calls"] += 1
+            
+            measure_memory = profiler.track_allocations and record["calls"] % profiler.allocation_sample_rate == 0
+            if measure_memory:
+                memory_before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                record["total"] += elapsed
+                record["samples"].append(elapsed)
+                if measure_memory:
+                    record["allocated"] += max(0, tracemalloc.get_traced_memory()[0] - memory_before)
+                    record["allocation_samples"] += 1
+        return wrapper
+    
+    def summary(self):
+        """Рядки (операція, викликів, сумарно с, p50 мс, p99 мс, середньо байт) за спаданням часу"""
+        rows = []
+        for name, record in self.stats.items():
+            samples = sorted(record["samples"])
+            p50 = samples[len(samples) // 2] if samples else 0
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0
+            allocated = record["allocated"] / record["allocation_samples"] if record["allocation_samples"] else 0
+            rows.append((name, record["calls"], record["total"], p50 * 1000, p99 * 1000, allocated))
+        rows.sort(key=lambda row: -row[2])
+        return rows
+    
+    def report(self):
+        report = "\n===== ПРОФІЛЮВАННЯ =====\n"
+        report += f"Стан: {'увімкнено' if self.enabled else 'вимкнено'}\n"
+        if not self.stats:
+            return report + "Даних ще немає\n"
+        report += f"{'Операція':<45}{'Викликів':>10}{'Всього, с':>12}{'p50, мс':>10}{'p99, мс':>10}{'Пам., Б':>10}\n"
+        for name, calls, total, p50, p99, allocated in self.summary():
+            report += f"{name:<45}{calls:>10}{total:>12.4f}{p50:>10.3f}{p99:>10.3f}{allocated:>10.0f}\n"
+        return report
+
+
+PROFILER = Profiler()
+
+
+class EventArchive:
+    """Стиснений архів застарілих записів журналів у часових сегментах на диску.
+    
+    Відбір записів виконується в потоці симуляції (зріз списку), а стиснення
+    і запис сегментів - у фоновому потоці.
+    """
+    
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    INDEX_FIELDS = ["файл", "початок", "кінець", "записів", "джерела"]
+    
+    def __init__(self, directory="archive", max_age=timedelta(minutes=30), segment_span=timedelta(hours=1), interval=10):
+        self.directory = directory
+        self.max_age = max_age
+        self.segment_span = segment_span
+        self.interval = interval
+        self.index_path = os.path.join(directory, "index.csv")
+        self.segments = []  # (початок, кінець, файл, записів, джерела), впорядковано за початком
+        self.archived = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._worker = threading.Thread(target=self._run, name="event-archive", daemon=True)
+        self._worker.start()
+    
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, newline="", encoding="utf-8") as index_file:
+            for row in csv.DictReader(index_file):
+                self.segments.append((
+                    datetime.strptime(row["початок"], self.TIME_FORMAT),
+                    datetime.strptime(row["кінець"], self.TIME_FORMAT),
+                    row["файл"], int(row["записів"]), row["джерела"],
+                ))
+        self.segments.sort()
+    
+    def sources(self, simulator):
+        """Журнали, що підлягають архівуванню: (вид, назва, власник, список)"""
+        yield "симулятор", "", simulator, simulator.events_log
+        for soldier in simulator.soldiers:
+            yield "солдат", soldier.name, soldier, soldier.history
+        for team in simulator.teams:
+            yield "команда", team.name, team, team.mission_log
+        for mission in simulator.missions:
+            yield "місія", mission.name, mission, mission.events
+    
+    def _aged_timestamps(self, entries, cutoff):
+        """Час записів префікса, старшого за межу; записи без часу успадковують час попереднього"""
+        timestamps = []
+        last = None
+        for entry in entries:
+            if isinstance(entry, LogEntry):
+                last = entry.timestamp
+            if last is None or last >= cutoff:
+                break
+            timestamps.append(last)
+        return timestamps
+    
+    def collect(self, simulator, now=None):
+        """Перенести застарілі записи з пам'яті до черги запису"""
+        cutoff = (now or datetime.now()) - self.max_age
+        batch = []
+        for kind, name, owner, entries in self.sources(simulator):
+            timestamps = self._aged_timestamps(entries, cutoff)
+            if not timestamps:
+                continue
+            count = len(timestamps)
+            batch.extend((timestamp, kind, name, str(entry)) for timestamp, entry in zip(timestamps, entries))
+            del entries[:count]
+            if hasattr(owner, "archived_log_entries"):
+                owner.archived_log_entries += count
+        simulator.event_store.discard_before(cutoff)
+        if batch:
+            self.archived += len(batch)
+            self._queue.put(batch)
+        return len(batch)
+    
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                self._write(batch)
+            finally:
+                self._queue.task_done()
+    
+    def _partition(self, timestamp):
+        span = int(self.segment_span.total_seconds())
+        epoch = int(timestamp.timestamp())
+        return datetime.fromtimestamp(epoch - epoch % span)
+    
+    def _write(self, batch):
+        partitions = {}
+        for record in batch:
+            partitions.setdefault(self._partition(record[0]), []).append(record)
+        
+        for partition, records in partitions.items():
+            records.sort(key=lambda record: record[0])
+            with self._lock:
+                part = sum(1 for segment in self.segments if segment[2].startswith(partition.strftime("%Y%m%d_%H%M%S")))
+            filename = f"{partition.strftime('%Y%m%d_%H%M%S')}_{part:04d}.jsonl.gz"
+            payload = "\n".join(
+                json.dumps([record[0].strftime(self.TIME_FORMAT), record[1], record[2], record[3]], ensure_ascii=False)
+                for record in records
+            )
+            with open(os.path.join(self.directory, filename), "wb") as segment_file:
+                segment_file.write(gzip.compress(payload.encode("utf-8")))
+            
+            sources = ";".join(sorted({record[1] for record in records}))
+            start, end = records[0][0], records[-1][0]
+            with self._lock:
+                new_index = not os.path.exists(self.index_path)
+                with open(self.index_path, "a", newline="", encoding="utf-8") as index_file:
+                    writer = csv.writer(index_file)
+                    if new_index:
+                        writer.writerow(self.INDEX_FIELDS)
+                    writer.writerow([filename, start.strftime(self.TIME_FORMAT), end.strftime(self.TIME_FORMAT), len(records), sources])
+                position = bisect_right([segment[0] for segment in self.segments], start)
+                self.segments.insert(position, (start, end, filename, len(records), sources))
+    
+    def flush(self):
+        """Дочекатися запису всіх поставлених у чергу записів"""
+        self._queue.join()
+    
+    def read(self, start=None, end=None, entity=None):
+        """Записи з архіву за проміжком часу; розпаковуються лише сегменти, що перетинають проміжок"""
+        self.flush()
+        with self._lock:
+            segments = [
+                segment for segment in self.segments
+                if (start is None or segment[1] >= start) and (end is None or segment[0] <= end)
+                and (entity is None or entity[0] in segment[4].split(";"))
+            ]
+        
+        results = []
+        for segment_start, segment_end, filename, count, sources in segments:
+            with open(os.path.join(self.directory, filename), "rb") as segment_file:
+                lines = gzip.decompress(segment_file.read()).decode("utf-8").split("\n")
+            for line in lines:
+                stamp, kind, name, text = json.loads(line)
+                timestamp = datetime.strptime(stamp, self.TIME_FORMAT)
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                if entity is not None and (kind, name) != entity:
+                    continue
+                results.append((timestamp, kind, name, text))
+        results.sort(key=lambda record: record[0])
+        return results
+    
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+
 class MilitarySimulator:
-    def __init__(self):
+    # Підсистеми тактів, стан яких записується для перемотування, у порядку відновлення
+    TICK_SYSTEMS = ("logistics", "medical", "engagement", "visibility", "radio", "geofences", "metrics")
+    
+    def __init__(self, seed=None):
         self.soldiers = []
         self.teams = []
         self.missions = []
+        self.units = []
         self.events_log = []
-        self.equipment_database = {
-            "Гвинтівка": {"вага": 4.5, "ефективність": 7},
-            "Пістолет": {"вага": 1.0, "ефективність": 4},
-            "Аптечка": {"вага": 2.0, "ефективність": 8},
-            "Рація": {"вага": 1.5, "ефективність": 6},
-            "Бінокль": {"вага": 1.0, "ефективність": 5},
-            "Патрони": {"вага": 0.5, "ефективність": 6},
-            "Граната": {"вага": 0.7, "ефективність": 8},
-            "Рація": {"вага": 1.0, "ефективність": 3},
-            "Вода": {"вага": 1.5, "ефективність": 4},
-            "Нічний приціл": {"вага": 1.2, "ефективність": 7}
-        }
+        self.event_store = EventStore()
+        self.status_index = StatusIndex(Soldier.STATUS_TYPES)
+        self.message_store = MessageStore()
+        self.message_bus = MessageBus(self.message_store)
+        self.message_bus.register_topic(MessageBus.THEATRE_TOPIC, lambda: self.teams + self.soldiers)
+        self.equipment_database = copy.deepcopy(EQUIPMENT_DATABASE)
         self.log_event("Військовий симулятор ініціалізовано")
+        self.rng = RandomStreams(seed, on_new_stream=self._log_stream_seed)
+        self.log_event("Головне зерно генератора випадкових чисел: {}", "загальне", self.rng.seed)
+        self.current_tick = 0
+        self.tick_handlers = []  # підсистеми, що оновлюються щотакту
+        self.replay = None
+        self._create_subsystems()
+        # Реєстратор створюється останнім: перший знімок включає стан підсистем
+        self.replay = ReplayRecorder(self)
+        self.rng.recorder = self.replay
+        self.archive = None
+    
+    def _create_subsystems(self):
+        """Створити підсистеми та зареєструвати їхні обробники тактів.
+        
+        Обробники звертаються до методу під час виклику, тож профілювання, увімкнене пізніше, їх охоплює.
+        """
+        self.logistics = LogisticsSystem(self)
+        self.tick_handlers.append(lambda tick: self.logistics.tick(tick))
+        self.medical = MedicalSystem(self)
+        self.tick_handlers.append(lambda tick: self.medical.tick(tick))
+        self.engagement = EngagementSystem(self)
+        self.tick_handlers.append(lambda tick: self.engagement.tick(tick))
+        self.visibility = VisibilitySystem(self)
+        self.tick_handlers.append(lambda tick: self.visibility.tick(tick))
+        self.radio = RadioNetwork(self)
+        self.tick_handlers.append(lambda tick: self.radio.tick(tick))
+        self.geofences = GeofenceSystem(self)
+        self.tick_handlers.append(lambda tick: self.geofences.tick(tick))
+        self.metrics = MetricsRecorder(self)
+        self.tick_handlers.append(lambda tick: self.metrics.tick(tick))
+    
+    def enable_archive(self, directory="archive", **options):
+        """Увімкнути фонове архівування застарілих записів журналів"""
+        self.archive = EventArchive(directory, **options)
+        self.tick_handlers.append(self._archive_tick)
+        self.log_event("Архів журналів: {}, вік записів понад {}", "архів", directory, self.archive.max_age)
+        return self.archive
+    
+    def _archive_tick(self, tick):
+        if tick % self.archive.interval == 0:
+            self.archive.collect(self)
     
     def create_soldier(self, name, status="Активний", location=(0, 0), rank="Рядовий"):
-        soldier = Soldier(name, status, location, rank)
+        soldier = Soldier(name, status, location, rank, message_store=self.message_store,
+                          equipment_database=self.equipment_database, event_store=self.event_store)
+        soldier.on_change = self._entity_changed
         self.soldiers.append(soldier)
-        self.log_event(f"Солдат створено: {name}")
+        soldier.status_indexes.append(self.status_index)
+        self.status_index.add(soldier)
+        self.log_event("Солдат створено: {}", "створення", name)
         return soldier
     
     def create_team(self, name):
-        team = Team(name)
+        team = Team(name, message_store=self.message_store, event_store=self.event_store, radio_network=self.radio)
+        team.on_change = self._entity_changed
+        team.message_bus = self.message_bus
         self.teams.append(team)
-        self.log_event(f"Команда створена: {name}")
+        self.message_bus.register_topic(MessageBus.team_topic(name), lambda: [team] + team.members)
+        self.log_event("Команда створена: {}", "створення", name)
         return team
     
     def create_mission(self, name, description, location):
-        mission = Mission(name, description, location)
+        mission = Mission(name, description, location, event_store=self.event_store)
+        mission.on_change = self._entity_changed
         self.missions.append(mission)
-        self.log_event(f"Місія створена: {name}")
+        self.message_bus.register_topic(
+            MessageBus.mission_topic(name),
+            lambda: [recipient for team in mission.teams for recipient in [team] + team.members]
+        )
+        self.log_event("Місія створена: {}", "створення", name)
         return mission
     
+    def create_unit(self, name, level, parent_name=None):
+        unit = Unit(name, level)
+        if parent_name:
+            parent = self.find_unit(parent_name)
+            if not parent or not parent.add_child(unit):
+                return None
+        self.units.append(unit)
+        self.log_event("Підрозділ створено: {}", "створення", unit)
+        return unit
+    
+    def find_unit(self, name):
+        for unit in self.units:
+            if unit.name.lower() == name.lower():
+                return unit
+        return None
+    
+    def assign_team_to_unit(self, team_name, unit_name):
+        team = self.find_team(team_name)
+        unit = self.find_unit(unit_name)
+        
+        if team and unit and unit.add_team(team):
+            self.log_event("Команда {} включена до підрозділу {}", "склад", team.name, unit)
+            return True
+        return False
+    
     def assign_soldier_to_team(self, soldier_name, team_name):
         soldier = self.find_soldier(soldier_name)
         team = self.find_team(team_name)
         
         if soldier and team:
             team.add_member(soldier)
-            self.log_event(f"{soldier.name} призначено до команди {team.name}")
+            self.log_event("{} призначено до команди {}", "склад", soldier.name, team.name)
             return True
         return False
     
@@ -525,10 +3791,14 @@ class MilitarySimulator:
         if team and mission:
             mission.add_team(team)
             team.assign_team_mission(mission.name)
-            self.log_event(f"Команда {team.name} призначена на місію {mission.name}")
+            self.log_event("Команда {} призначена на місію {}", "місія", team.name, mission.name)
             return True
         return False
     
+    def soldiers_with_status(self, status):
+        """Повернути всіх солдатів симулятора з вказаним статусом"""
+        return self.status_index.get(status)
+    
     def find_soldier(self, name):
         for soldier in self.soldiers:
             if soldier.name.lower() == name.lower():
@@ -547,25 +3817,182 @@ class MilitarySimulator:
                 return mission
         return None
     
-    def log_event(self, description):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        event = f"{timestamp}: {description}"
+    def log_event(self, template, event_type="загальне", *args):
+        event = EVENT_TEMPLATES.encode(template, args)
         self.events_log.append(event)
+        self.event_store.record("симулятор", "", event_type, event)
         return event
     
+    def tick(self):
+        """Просунути симуляцію на один такт"""
+        self.current_tick += 1
+        self.message_bus.dispatch()
+        for handler in self.tick_handlers:
+            handler(self.current_tick)
+        if self.replay:
+            self.replay.capture(self.current_tick)
+        return self.current_tick
+    
+    def capture_systems(self):
+        """Знімок внутрішнього стану підсистем тактів"""
+        return {name: getattr(self, name).snapshot() for name in self.TICK_SYSTEMS}
+    
+    def apply_systems(self, snapshot):
+        """Відновити підсистеми тактів зі знімка capture_systems після відновлення сутностей"""
+        # Видимість і зв'язок перебудовуються з уже відновлених загонів і солдатів
+        for name in self.TICK_SYSTEMS:
+            getattr(self, name).restore(snapshot[name])
+    
+    def capture_state(self):
+        """Знімок змінного стану всіх сутностей у вигляді простих даних"""
+        soldier_ids = {id(soldier): i for i, soldier in enumerate(self.soldiers)}
+        team_ids = {id(team): i for i, team in enumerate(self.teams)}
+        state = {}
+        
+        for i, soldier in enumerate(self.soldiers):
+            state[("soldier", i)] = self.soldier_record(soldier)
+        for i, team in enumerate(self.teams):
+            state[("team", i)] = self.team_record(team, soldier_ids)
+        for i, mission in enumerate(self.missions):
+            state[("mission", i)] = self.mission_record(mission, team_ids)
+        return state
+    
+    @staticmethod
+    def soldier_record(soldier):
+        return (
+            soldier.name, soldier.status, soldier.location, soldier.rank, soldier.health,
+            soldier.experience, soldier.mission,
+            tuple(soldier.skills.items()), tuple(soldier.equipment.items())
+        )
+    
+    @staticmethod
+    def team_record(team, soldier_ids):
+        return (
+            team.name, tuple(soldier_ids[id(member)] for member in team.members if id(member) in soldier_ids),
+            soldier_ids.get(id(team.commander)), team.location, team.status
+        )
+    
+    @staticmethod
+    def mission_record(mission, team_ids):
+        return (
+            mission.name, mission.status, mission.difficulty, mission.success_rate,
+            tuple(mission.rewards.items()), mission.start_time, mission.end_time,
+            tuple(team_ids[id(team)] for team in mission.teams if id(team) in team_ids),
+            tuple((obj["description"], tuple(obj["requires"]), obj["completed"]) for obj in mission.objectives)
+        )
+    
+    def apply_state(self, state):
+        """Привести живі об'єкти у відповідність до знімка capture_state"""
+        counts = {"soldier": 0, "team": 0, "mission": 0}
+        for kind, index in state:
+            counts[kind] = max(counts[kind], index + 1)
+        
+        # Сутності, створені після знімка, видаляються
+        for soldier in self.soldiers[counts["soldier"]:]:
+            self.status_index.discard(soldier)
+        del self.soldiers[counts["soldier"]:]
+        del self.teams[counts["team"]:]
+        del self.missions[counts["mission"]:]
+        
+        for i, soldier in enumerate(self.soldiers):
+            (soldier.name, status, soldier.location, soldier.rank, soldier.health,
+             soldier.experience, soldier.mission, skills, equipment) = state[("soldier", i)]
+            soldier.skills = dict(skills)
+            soldier.equipment = dict(equipment)
+            soldier._set_status(status)
+            soldier.invalidate_metrics()
+        
+        for i, team in enumerate(self.teams):
+            team.name, member_ids, commander_id, team.location, team.status = state[("team", i)]
+            for member in team.members:
+                if team.status_index in member.status_indexes:
+                    member.status_indexes.remove(team.status_index)
+            team.members = [self.soldiers[member_id] for member_id in member_ids]
+            team.status_index = StatusIndex(Soldier.STATUS_TYPES, on_change=team.invalidate_metrics)
+            for member in team.members:
+                member.status_indexes.append(team.status_index)
+                team.status_index.add(member)
+            team.commander = self.soldiers[commander_id] if commander_id is not None else None
+        
+        for i, mission in enumerate(self.missions):
+            (mission.name, mission.status, mission.difficulty, mission.success_rate, rewards,
+             mission.start_time, mission.end_time, team_ids, objectives) = state[("mission", i)]
+            mission.rewards = dict(rewards)
+            mission.teams = [self.teams[team_id] for team_id in team_ids]
+            del mission.objectives[len(objectives):]
+            for j, (description, requires, completed) in enumerate(objectives):
+                if j < len(mission.objectives):
+                    mission.objectives[j]["completed"] = completed
+                else:
+                    mission.objectives.append({"description": description, "completed": completed,
+                                               "added": datetime.now(), "requires": list(requires)})
+            mission._rebuild_objective_state()
+    
+    def allocate_equipment(self, pool, teams=None, carry_limit=None, apply=True):
+        """Розподілити запас спорядження між активними членами команд з урахуванням ваги та навичок"""
+        teams = self.teams if teams is None else teams
+        if apply:
+            teams = [self.own(team) for team in teams]
+        soldiers = list(dict.fromkeys(member for team in teams for member in team.members_with_status("Активний")))
+        
+        allocator = EquipmentAllocator(self.equipment_database, carry_limit)
+        allocation, leftover = allocator.allocate(soldiers, pool)
+        
+        if apply:
+            for soldier, items in allocation.items():
+                for item, quantity in items.items():
+                    soldier.add_equipment(item, quantity)
+            self.log_event("Спорядження розподілено між {} солдатами {} команд", "спорядження", len(allocation), len(teams))
+        return allocation, leftover
+    
+    def optimize_assignments(self, teams=None, missions=None, min_active=1, max_distance=None, method="auto", apply=False,
+                             reassign=False):
+        """Підібрати команди для місій, що очікують, з максимальною сумарною ймовірністю успіху.
+        
+        Команди, вже призначені на незавершену місію, не розглядаються, якщо не задано reassign.
+        """
+        teams = self.teams if teams is None else teams
+        if not reassign:
+            busy = {team.name for mission in self.missions if mission.status in ("Очікує", "Активна") for team in mission.teams}
+            teams = [team for team in teams if team.name not in busy]
+        missions = [mission for mission in self.missions if mission.status == "Очікує"] if missions is None else missions
+        
+        optimizer = AssignmentOptimizer(min_active=min_active, max_distance=max_distance)
+        plan = optimizer.solve(teams, missions, method=method)
+        self.log_event("Оптимізатор розподілу запропонував {} призначень", "місія", len(plan))
+        
+        if apply:
+            for team, mission, _ in plan:
+                team, mission = self.own(team), self.own(mission)
+                mission.add_team(team)
+                team.assign_team_mission(mission.name)
+                self.log_event("Команда {} призначена на місію {}", "місія", team.name, mission.name)
+        return plan
+    
+    def own(self, obj):
+        """Повернути об'єкт, який цей симулятор може змінювати; дочірні сценарії створюють копію"""
+        return obj
+    
+    def fork(self, seed=None, record=False):
+        """Створити дочірній сценарій з копіюванням об'єктів лише при зміні"""
+        return ScenarioFork(self, seed=seed, record=record)
+    
+    def _log_stream_seed(self, name, seed):
+        self.log_event("Потік випадкових чисел {}: зерно {}", "загальне", name, seed)
+    
+    def _entity_changed(self, entity):
+        if self.replay:
+            self.replay.mark_dirty(entity)
+    
     def global_status_report(self):
         report = "\n===== ЗАГАЛЬНИЙ ЗВІТ ПРО СТАН =====\n"
         
         report += f"Всього персоналу: {len(self.soldiers)}\n"
         report += f"Активні команди: {len(self.teams)}\n"
-        report += f"Місії: {len(self.missions)}\n\n"
+        report += f"Місії: {len(self.missions)}\n"
+        report += f"Бойова міць активного складу команд: {round(sum(team.metrics()['бойова міць'] for team in self.teams), 2)}\n\n"
         
-        status_counts = {}
-        for soldier in self.soldiers:
-            if soldier.status in status_counts:
-                status_counts[soldier.status] += 1
-            else:
-                status_counts[soldier.status] = 1
+        status_counts = self.status_index.counts()
                 
         report += "Статус персоналу:\n"
         for status, count in status_counts.items():
@@ -598,6 +4025,9 @@ class MilitarySimulator:
             
         if mission.status not in ["Очікує", "Активна"]:
             return False
+        
+        # Доставка накопичених повідомлень одним пакетом на крок симуляції
+        self.message_bus.dispatch()
             
         # Початок місії, якщо вона очікує
         if mission.status == "Очікує":
@@ -607,40 +4037,42 @@ class MilitarySimulator:
         if success_chance is None:
             success_chance = mission.calculate_success_probability()
             
-        # Обробка кожної цілі
-        for i, objective in enumerate(mission.objectives):
-            if not objective["completed"]:
-                # Випадковий шанс завершення цілі на основі ймовірності успіху
-                if random.random() * 100 < success_chance:
-                    mission.complete_objective(i)
-                    
-                    # Випадкові події під час місії
-                    if random.random() < 0.3:  # 30% шанс випадкової події
-                        events = [
-                            "зустріли легкий опір",
-                            "знайшли цінну інформацію",
-                            "знайшли альтернативний маршрут",
-                            "сталася поломка обладнання",
-                            "погода погіршилася"
-                        ]
-                        mission.log_event(f"Випадкова подія: {random.choice(events)}")
-                    
-                    # Випадкові поранення
-                    if random.random() < 0.2:  # 20% шанс поранення
-                        for team in mission.teams:
-                            for member in team.members:
-                                if member.status == "Активний" and random.random() < 0.1:
-                                    damage = random.randint(5, 25)
-                                    member.update_health(-damage)
-                                    mission.log_event(f"{member.name} отримав {damage} пошкоджень")
-                else:
-                    # Ціль провалена
-                    mission.log_event(f"Не вдалося завершити ціль: {objective['description']}")
-                    if random.random() < 0.3:  # 30% шанс провалу місії при провалі цілі
-                        mission.update_status("Провалена")
-                        return mission.status
-                        
-                break  # Обробляти одну ціль за раз
+        # Окремий потік випадкових чисел для кожної місії
+        rng = self.rng.stream("місія", mission.name)
+        
+        # Обробка наступної готової цілі без зони
+        i = mission.next_objective(skip_geofenced=True)
+        if i is not None:
+            objective = mission.objectives[i]
+            # Випадковий шанс завершення цілі на основі ймовірності успіху
+            if rng.random() * 100 < success_chance:
+                mission.complete_objective(i)
+                
+                # Випадкові події під час місії
+                if rng.random() < 0.3:  # 30% шанс випадкової події
+                    events = [
+                        "зустріли легкий опір",
+                        "знайшли цінну інформацію",
+                        "знайшли альтернативний маршрут",
+                        "сталася поломка обладнання",
+                        "погода погіршилася"
+                    ]
+                    mission.log_event("Випадкова подія: {}", "випадкова подія", rng.choice(events))
+                
+                # Випадкові поранення
+                if rng.random() < 0.2:  # 20% шанс поранення
+                    for team in mission.teams:
+                        for member in team.members_with_status("Активний"):
+                            if rng.random() < 0.1:
+                                damage = rng.randint(5, 25)
+                                member.update_health(-damage)
+                                mission.log_event("{} отримав {} пошкоджень", "поранення", member.name, damage)
+            else:
+                # Ціль провалена
+                mission.log_event("Не вдалося завершити ціль: {}", "ціль", objective['description'])
+                if rng.random() < 0.3:  # 30% шанс провалу місії при провалі цілі
+                    mission.update_status("Провалена")
+                    return mission.status
                 
         return mission.status
     
@@ -657,9 +4089,12 @@ class MilitarySimulator:
         print("3. Керування місіями")
         print("4. Керування симуляцією")
         print("5. Звіти")
-        print("6. Вийти")
+        print("6. Тилове забезпечення")
+        print("7. Керування підрозділами")
+        print("8. Бойові дії")
+        print("9. Вийти")
         
-        choice = input("\nВведіть ваш вибір (1-6): ")
+        choice = input("\nВведіть ваш вибір (1-9): ")
         return choice
     
     def soldier_menu(self):
@@ -772,9 +4207,10 @@ class MilitarySimulator:
         print("6. Згенерувати звіт про спорядження")
         print("7. Розподілити спорядження")
         print("8. Список усіх команд")
-        print("9. Повернутися до головного меню")
+        print("9. Оптимально розподілити спорядження між усіма командами")
+        print("0. Повернутися до головного меню")
         
-        choice = input("\nВведіть ваш вибір (1-9): ")
+        choice = input("\nВведіть ваш вибір (0-9): ")
         
         if choice == "1":
             name = input("Введіть назву команди: ")
@@ -892,6 +4328,32 @@ class MilitarySimulator:
                     commander_name = team.commander.name if team.commander else "Немає"
                     print(f"{i}. {team.name} - Членів: {len(team.members)}, Командир: {commander_name}")
                     
+        elif choice == "9":
+            print("Доступне спорядження:")
+            for item in self.equipment_database:
+                print(f"- {item}")
+                
+            pool = {}
+            while True:
+                item = input("Введіть спорядження для розподілу (або 'done' для завершення): ")
+                if item.lower() == 'done':
+                    break
+                
+                if item in self.equipment_database:
+                    try:
+                        pool[item] = int(input("Введіть кількість: "))
+                    except ValueError:
+                        print("Невірна кількість")
+                else:
+                    print(f"Спорядження '{item}' не знайдено в базі даних")
+            
+            if pool:
+                allocation, leftover = self.allocate_equipment(pool)
+                for soldier, items in allocation.items():
+                    print(f"- {soldier.name}: {', '.join(f'{item} x{quantity}' for item, quantity in items.items())}")
+                if leftover:
+                    print(f"Не розподілено (ліміт ваги): {leftover}")
+                    
         input("\nНатисніть Enter, щоб продовжити...")
         
     def mission_menu(self):
@@ -955,8 +4417,24 @@ class MilitarySimulator:
             
             if mission:
                 objective = input("Введіть опис цілі: ")
-                mission.add_objective(objective)
-                print(f"Ціль додано до місії {mission_name}")
+                requires_input = input("Введіть номери цілей-передумов через кому (необов'язково): ")
+                zone_input = input("Введіть зону цілі x,y,радіус (необов'язково): ")
+                try:
+                    requires = [int(part) - 1 for part in requires_input.split(",") if part.strip()]
+                    zone = {}
+                    if zone_input.strip():
+                        x, y, radius = (float(part) for part in zone_input.split(","))
+                        zone = {"location": (x, y), "radius": radius}
+                        condition = input("Умова (прибуття/утримання, за замовчуванням: прибуття): ") or "прибуття"
+                        zone["condition"] = condition
+                        if condition == "утримання":
+                            zone["hold_ticks"] = int(input("Введіть кількість тактів утримання: "))
+                    if mission.add_objective(objective, requires=requires, **zone):
+                        print(f"Ціль додано до місії {mission_name}")
+                    else:
+                        print("Невірні номери цілей-передумов або умова")
+                except ValueError:
+                    print("Невірне введення")
             else:
                 print(f"Місію '{mission_name}' не знайдено")
                 
@@ -975,7 +4453,7 @@ class MilitarySimulator:
                     if mission.complete_objective(index):
                         print("Ціль завершена")
                     else:
-                        print("Невірний номер цілі")
+                        print("Невірний номер цілі або передумови не виконані")
                 except ValueError:
                     print("Невірне введення")
             else:
@@ -1013,6 +4491,31 @@ class MilitarySimulator:
             if mission:
                 probability = mission.calculate_success_probability()
                 print(f"Ймовірність успіху місії: {probability}%")
+                
+                if input("Запустити перебір параметрів? (т/н): ").lower() == "т":
+                    try:
+                        difficulties = [int(part) for part in input("Рівні складності через кому: ").split(",") if part.strip()]
+                        print("Набори команд: назви через кому, набори через ';' (Enter - поточні команди місії)")
+                        team_sets = [
+                            [name.strip() for name in team_set.split(",") if name.strip()]
+                            for team_set in input("Набори команд: ").split(";") if team_set.strip()
+                        ]
+                        loadouts = dict(ParameterSweep.DEFAULT_LOADOUTS)
+                        while True:
+                            loadout_name = input("Назва додаткового комплекту спорядження (або 'done'): ")
+                            if loadout_name.lower() == "done" or not loadout_name:
+                                break
+                            loadouts[loadout_name] = {}
+                            for part in input("Спорядження на кожного: предмет=кількість через кому: ").split(","):
+                                if "=" in part:
+                                    item, quantity = part.split("=", 1)
+                                    loadouts[loadout_name][item.strip()] = int(quantity)
+                        
+                        sweep = ParameterSweep(self, mission_name, difficulties or None, team_sets or None, loadouts)
+                        sweep.run(progress=lambda done, total: print(f"Оцінено точок: {done}/{total}"))
+                        print(sweep.table(limit=20))
+                    except ValueError as error:
+                        print(f"Невірне введення: {error}")
             else:
                 print(f"Місію '{mission_name}' не знайдено")
               
@@ -1038,7 +4541,7 @@ class MilitarySimulator:
             else:
                 print("\n===== УСІ МІСІЇ =====")
                 for i, mission in enumerate(self.missions, 1):
-                    completed = sum(1 for obj in mission.objectives if obj["completed"])
+                    completed = mission.completed_count
                     total = len(mission.objectives)
                     print(f"{i}. {mission.name} - Статус: {mission.status}, Цілі: {completed}/{total}, Команди: {len(mission.teams)}")
                     
@@ -1052,9 +4555,13 @@ class MilitarySimulator:
         print("2. Автоматично завершити місію")
         print("3. Згенерувати подію з пораненням")
         print("4. Згенерувати випадкову подію")
-        print("5. Повернутися до головного меню")
+        print("5. Надіслати повідомлення через шину")
+        print("6. Просунути симуляцію на кілька тактів")
+        print("7. Переглянути зміни на такті")
+        print("8. Перемотати симуляцію до такту")
+        print("9. Повернутися до головного меню")
         
-        choice = input("\nВведіть ваш вибір (1-5): ")
+        choice = input("\nВведіть ваш вибір (1-9): ")
         
         if choice == "1":
             mission_name = input("Введіть назву місії: ")
@@ -1062,6 +4569,7 @@ class MilitarySimulator:
             
             if mission:
                 status = self.simulate_mission_progress(mission_name)
+                self.tick()
                 print(f"Прогрес місії симульовано. Новий статус: {status}")
             else:
                 print(f"Місію '{mission_name}' не знайдено")
@@ -1075,10 +4583,9 @@ class MilitarySimulator:
                     mission.update_status("Активна")
                     
                     print(f"Автоматичне завершення місії {mission_name}...")
-                    for i in range(len(mission.objectives)):
-                        if not mission.objectives[i]["completed"]:
-                            mission.complete_objective(i)
-                            time.sleep(0.5)  # Невелика затримка для ефекту
+                    while mission.next_objective() is not None:
+                        mission.complete_objective(mission.next_objective())
+                        time.sleep(0.5)  # Невелика затримка для ефекту
                     
                     mission.update_status("Завершена")
                     print(f"Місія {mission_name} автоматично завершена")
@@ -1092,17 +4599,18 @@ class MilitarySimulator:
             team = self.find_team(team_name)
             
             if team:
-                active_members = [m for m in team.members if m.status == "Активний"]
+                active_members = team.members_with_status("Активний")
                 if not active_members:
                     print("Немає активних членів у команді")
                 else:
-                    victim = random.choice(active_members)
-                    damage = random.randint(10, 50)
+                    rng = self.rng.stream("поранення")
+                    victim = rng.choice(active_members)
+                    damage = rng.randint(10, 50)
                     
                     print(f"Згенеровано подію з пораненням для {victim.name}")
                     victim.update_health(-damage)
                     
-                    team.log_event(f"Подія з пораненням: {victim.name} отримав {damage} пошкоджень")
+                    team.log_event("Подія з пораненням: {} отримав {} пошкоджень", "поранення", victim.name, damage)
                     print(f"Здоров'я {victim.name} знижено до {victim.health}")
                     
                     if victim.status == "Поранений":
@@ -1128,12 +4636,60 @@ class MilitarySimulator:
                     "зайняли ключову позицію"
                 ]
                 
-                event = random.choice(events)
-                mission.log_event(f"Випадкова подія: {event}")
+                event = self.rng.stream("події").choice(events)
+                mission.log_event("Випадкова подія: {}", "випадкова подія", event)
                 print(f"Згенеровано випадкову подію для місії {mission_name}: {event}")
             else:
                 print(f"Місію '{mission_name}' не знайдено")
               
+        elif choice == "5":
+            print("Адресати: команда:<назва>, місія:<назва>, театр")
+            topic = input("Введіть тему: ")
+            message = input("Введіть повідомлення: ")
+            priority = input("Введіть пріоритет (Блискавичне/Негайне/Звичайне, за замовчуванням: Звичайне): ") or "Звичайне"
+            
+            if not self.message_bus.has_topic(topic):
+                print(f"Тему '{topic}' не знайдено")
+            elif self.message_bus.publish(topic, message, priority=priority):
+                delivered = self.message_bus.dispatch()
+                print(f"Доставлено повідомлень: {delivered}, у черзі: {self.message_bus.pending()}")
+            else:
+                print("Невірний пріоритет")
+              
+        elif choice == "6":
+            try:
+                ticks = int(input("Введіть кількість тактів: "))
+                for _ in range(ticks):
+                    self.tick()
+                print(f"Поточний такт: {self.current_tick}")
+            except ValueError:
+                print("Невірне введення")
+              
+        elif choice in ["7", "8"] and self.replay is None:
+            print("Запис історії для цієї симуляції вимкнено")
+              
+        elif choice == "7":
+            try:
+                tick = int(input(f"Введіть такт (0-{self.current_tick}): "))
+                changes = self.replay.changes_at(tick)
+                if not changes:
+                    print(f"На такті {tick} змін не зафіксовано")
+                for (kind, index), record in changes.items():
+                    print(f"- {kind} #{index}: {record}")
+            except ValueError:
+                print("Невірне введення")
+              
+        elif choice == "8":
+            try:
+                tick = int(input(f"Введіть такт (0-{self.current_tick}): "))
+                if self.replay.restore(tick):
+                    self.log_event("Симуляцію перемотано до такту {}", "загальне", tick)
+                    print(f"Симуляцію перемотано до такту {tick}")
+                else:
+                    print("Невірний такт")
+            except ValueError:
+                print("Невірне введення")
+              
         input("\nНатисніть Enter, щоб продовжити...")
     
     def reports_menu(self):
@@ -1146,9 +4702,12 @@ class MilitarySimulator:
         print("4. Журнал останніх подій")
         print("5. Підсумок спорядження")
         print("6. Статус персоналу")
-        print("7. Повернутися до головного меню")
+        print("7. Оптимальний розподіл команд по місіях")
+        print("8. Історія показників")
+        print("9. Профілювання продуктивності")
+        print("0. Повернутися до головного меню")
         
-        choice = input("\nВведіть ваш вибір (1-7): ")
+        choice = input("\nВведіть ваш вибір (0-9): ")
         
         if choice == "1":
             print(self.global_status_report())
@@ -1172,6 +4731,8 @@ class MilitarySimulator:
                     print(f"Статус: {mission.status}")
                     print(f"Складність: {mission.difficulty}/10")
                     print(f"Ймовірність успіху: {probability}%")
+                    if mission.teams:
+                        print(f"Оцінка Монте-Карло для решти цілей: {mission.monte_carlo_success()}%")
                     
                     # Показати причини на основі складу команди
                     print("Чинники, що впливають на ймовірність:")
@@ -1182,16 +4743,45 @@ class MilitarySimulator:
                     
                     # Кількість персоналу
                     total_personnel = sum(len(team.members) for team in mission.teams)
-                    active_personnel = sum(sum(1 for m in team.members if m.status == "Активний") for team in mission.teams)
+                    active_personnel = sum(team.status_index.count("Активний") for team in mission.teams)
                     print(f"- Персонал: {active_personnel} активних з {total_personnel} всього")
                     
                     print("\n")
+                
+                stats = SUCCESS_CACHE.stats()
+                print(f"Кеш оцінок: {stats['записів']} записів, влучань {stats['влучань']}, промахів {stats['промахів']} ({stats['частка влучань']}%)")
               
         elif choice == "4":
-            print("\n===== ЖУРНАЛ ОСТАННІХ ПОДІЙ =====")
-            logs_to_show = min(20, len(self.events_log))
-            for log in self.events_log[-logs_to_show:]:
-                print(log)
+            print("\n===== ЖУРНАЛ ПОДІЙ =====")
+            print("Типи подій: " + ", ".join(f"{t} ({n})" for t, n in sorted(self.event_store.counts_by_type().items())))
+            print("Сутність: 1. Усі  2. Солдат  3. Команда  4. Місія  5. Симулятор")
+            kind_choice = input("Оберіть сутність: ")
+            entity = None
+            kinds = {"2": "солдат", "3": "команда", "4": "місія"}
+            if kind_choice in kinds:
+                entity = (kinds[kind_choice], input("Введіть назву/ім'я: "))
+            elif kind_choice == "5":
+                entity = ("симулятор", "")
+            event_type = input("Тип події (Enter - усі): ").strip() or None
+            minutes = input("За останні N хвилин (Enter - весь час): ").strip()
+            start = None
+            if minutes:
+                try:
+                    start = datetime.now() - timedelta(minutes=float(minutes))
+                except ValueError:
+                    print("Невірне значення, показано весь час.")
+            
+            events = self.event_store.query(entity=entity, event_type=event_type, start=start, limit=20)
+            if not events:
+                print("Подій не знайдено.")
+            for seq, timestamp, entity_kind, entity_name, kind, text in events:
+                print(f"[{kind}] {text}")
+            
+            if self.archive and self.archive.segments and input("Показати записи з архіву? (т/н): ").lower() == "т":
+                archived = self.archive.read(start=start, entity=entity)
+                print(f"\n--- Архів: {len(archived)} записів ---")
+                for timestamp, entity_kind, entity_name, text in archived[-20:]:
+                    print(text)
               
         elif choice == "5":
             print("\n===== ПІДСУМОК СПОРЯДЖЕННЯ =====")
@@ -1220,17 +4810,257 @@ class MilitarySimulator:
             if not self.soldiers:
                 print("Персоналу не знайдено")
             else:
-                status_groups = {}
-                for soldier in self.soldiers:
-                    if soldier.status not in status_groups:
-                        status_groups[soldier.status] = []
-                    status_groups[soldier.status].append(soldier)
-                
-                for status, soldiers in status_groups.items():
-                    print(f"\n{status} Персонал ({len(soldiers)}):")
-                    for soldier in soldiers:
+                for status, group in self.status_index.groups.items():
+                    if not group:
+                        continue
+                    print(f"\n{status} Персонал ({len(group)}):")
+                    for soldier in group:
                         print(f"- {soldier.rank} {soldier.name}, Здоров'я: {soldier.health}%")
               
+        elif choice == "7":
+            print("\n===== ОПТИМАЛЬНИЙ РОЗПОДІЛ КОМАНД =====")
+            try:
+                min_active = int(input("Мінімум активних членів у команді (за замовчуванням: 1): ") or "1")
+                distance_input = input("Максимальна відстань до місії (Enter - без обмежень): ")
+                max_distance = float(distance_input) if distance_input else None
+            except ValueError:
+                print("Невірне введення")
+            else:
+                plan = self.optimize_assignments(min_active=min_active, max_distance=max_distance)
+                if not plan:
+                    print("Допустимих призначень не знайдено")
+                else:
+                    for team, mission, score in plan:
+                        print(f"- {team.name} -> {mission.name}: {score:.1f}%")
+                    print(f"Сумарна очікувана ймовірність: {sum(score for _, _, score in plan):.1f}")
+                    
+                    if input("Застосувати розподіл? (y/n): ").lower() == 'y':
+                        for team, mission, _ in plan:
+                            self.assign_team_to_mission(team.name, mission.name)
+                        print("Розподіл застосовано")
+              
+        elif choice == "8":
+            print("\n===== ІСТОРІЯ ПОКАЗНИКІВ =====")
+            try:
+                last = int(input("Кількість останніх тактів (за замовчуванням: 20): ") or "20")
+            except ValueError:
+                print("Невірне введення")
+            else:
+                start = max(0, self.current_tick - last + 1)
+                for name in self.metrics.series:
+                    points = self.metrics.window(name, start, self.current_tick)
+                    values = ", ".join(f"{value:g}" for _, value in points)
+                    print(f"- {name}: {values or 'немає даних'}")
+                
+                path = input("Файл для експорту CSV (Enter - пропустити): ")
+                if path:
+                    try:
+                        self.metrics.export_csv(path)
+                        print(f"Показники експортовано до {path}")
+                    except OSError as error:
+                        print(f"Не вдалося записати файл: {error}")
+              
+        elif choice == "9":
+            print(PROFILER.report())
+            if PROFILER.enabled:
+                action = input("Вимкнути профілювання (d), скинути статистику (r) або Enter: ").lower()
+                if action == "d":
+                    PROFILER.disable()
+                    print("Профілювання вимкнено")
+                elif action == "r":
+                    PROFILER.reset()
+                    print("Статистику скинуто")
+            elif input("Увімкнути профілювання? (y/n): ").lower() == 'y':
+                track = input("Відстежувати виділення пам'яті (tracemalloc)? (y/n): ").lower() == 'y'
+                PROFILER.enable(track_allocations=track)
+                print("Профілювання увімкнено")
+              
+        input("\nНатисніть Enter, щоб продовжити...")
+    
+    def support_menu(self):
+        """Показати меню тилового забезпечення"""
+        self.clear_screen()
+        print("\n===== ТИЛОВЕ ЗАБЕЗПЕЧЕННЯ =====")
+        print("1. Створити склад")
+        print("2. Поповнити запаси складу")
+        print("3. Подати заявку на поповнення команди")
+        print("4. Стан логістики")
+        print("5. Стан медичної служби")
+        print("6. Повернутися до головного меню")
+        
+        choice = input("\nВведіть ваш вибір (1-6): ")
+        
+        if choice == "1":
+            name = input("Введіть назву складу: ")
+            try:
+                x = int(input("Введіть x-координату: "))
+                y = int(input("Введіть y-координату: "))
+                depot = self.logistics.add_depot(name, (x, y))
+                print(f"Створено: {depot}")
+            except ValueError:
+                print("Невірний формат координат")
+              
+        elif choice == "2":
+            depot_name = input("Введіть назву складу: ")
+            depot = self.logistics.find_depot(depot_name)
+            
+            if depot:
+                item = input("Введіть спорядження: ")
+                if item in self.equipment_database:
+                    try:
+                        quantity = int(input("Введіть кількість: "))
+                        if depot.store({item: quantity}):
+                            print(f"Додано {quantity} {item} на склад {depot.name}")
+                        else:
+                            print("Кількість має бути додатною")
+                    except ValueError:
+                        print("Невірна кількість")
+                else:
+                    print(f"Спорядження '{item}' не знайдено в базі даних")
+            else:
+                print(f"Склад '{depot_name}' не знайдено")
+              
+        elif choice == "3":
+            team_name = input("Введіть назву команди: ")
+            team = self.find_team(team_name)
+            
+            if team:
+                items = {}
+                while True:
+                    item = input("Введіть спорядження (або 'done' для завершення): ")
+                    if item.lower() == 'done':
+                        break
+                    if item in self.equipment_database:
+                        try:
+                            items[item] = int(input("Введіть кількість: "))
+                        except ValueError:
+                            print("Невірна кількість")
+                    else:
+                        print(f"Спорядження '{item}' не знайдено в базі даних")
+                
+                if self.logistics.request_resupply(team, items):
+                    print("Заявку додано до черги")
+            else:
+                print(f"Команду '{team_name}' не знайдено")
+              
+        elif choice == "4":
+            print(self.logistics.status_report())
+              
+        elif choice == "5":
+            print(self.medical.status_report())
+              
+        input("\nНатисніть Enter, щоб продовжити...")
+    
+    def combat_menu(self):
+        """Показати меню бойових дій"""
+        self.clear_screen()
+        print("\n===== БОЙОВІ ДІЇ =====")
+        print("1. Додати ворожий загін")
+        print("2. Ввести команду в бій")
+        print("3. Бойова обстановка")
+        print("4. Туман війни")
+        print("5. Радіозв'язок")
+        print("6. Повернутися до головного меню")
+        
+        choice = input("\nВведіть ваш вибір (1-6): ")
+        
+        if choice == "1":
+            name = input("Введіть назву загону: ")
+            try:
+                x = int(input("Введіть x-координату: "))
+                y = int(input("Введіть y-координату: "))
+                strength = int(input("Введіть кількість бійців: "))
+                skill = int(input("Введіть бойову навичку бійців (за замовчуванням: 3): ") or 3)
+                weapon = input("Введіть зброю (за замовчуванням: Гвинтівка): ") or "Гвинтівка"
+                behaviour = input(f"Введіть поведінку ({'/'.join(EnemyForce.BEHAVIOURS)}, за замовчуванням: оборона): ") or "оборона"
+                if behaviour not in EnemyForce.BEHAVIOURS:
+                    print("Невірна поведінка")
+                else:
+                    waypoints = None
+                    if behaviour != "оборона":
+                        tx = int(input("Введіть x-координату цільової точки: "))
+                        ty = int(input("Введіть y-координату цільової точки: "))
+                        waypoints = [(x, y), (tx, ty)] if behaviour == "патрулювання" else [(tx, ty)]
+                    force = self.engagement.add_force(name, (x, y), strength, skill, weapon, behaviour, waypoints)
+                    print(f"Додано: {force}")
+            except ValueError:
+                print("Невірне введення")
+              
+        elif choice == "2":
+            team_name = input("Введіть назву команди: ")
+            team = self.find_team(team_name)
+            
+            if team:
+                force_name = input("Введіть назву ворожого загону: ")
+                if self.engagement.engage(team, force_name):
+                    print(f"Команда {team_name} вступила в бій. Бій розраховується щотакту.")
+                else:
+                    print(f"Загін '{force_name}' не знайдено або його знищено")
+            else:
+                print(f"Команду '{team_name}' не знайдено")
+              
+        elif choice == "3":
+            print(self.engagement.status_report())
+              
+        elif choice == "4":
+            print(self.visibility.status_report())
+              
+        elif choice == "5":
+            print(self.radio.status_report())
+              
+        input("\nНатисніть Enter, щоб продовжити...")
+    
+    def unit_menu(self):
+        """Показати меню керування підрозділами"""
+        self.clear_screen()
+        print("\n===== КЕРУВАННЯ ПІДРОЗДІЛАМИ =====")
+        print("1. Створити підрозділ")
+        print("2. Включити команду до відділення")
+        print("3. Звіт про підрозділ")
+        print("4. Список усіх підрозділів")
+        print("5. Повернутися до головного меню")
+        
+        choice = input("\nВведіть ваш вибір (1-5): ")
+        
+        if choice == "1":
+            name = input("Введіть назву підрозділу: ")
+            level = input(f"Введіть рівень ({'/'.join(Unit.LEVELS)}): ")
+            if level not in Unit.LEVELS:
+                print("Невірний рівень")
+            else:
+                parent_name = input("Введіть назву вищого підрозділу (необов'язково): ")
+                unit = self.create_unit(name, level, parent_name or None)
+                if unit:
+                    print(f"Підрозділ створено: {unit}")
+                else:
+                    print("Вищий підрозділ не знайдено або його рівень не вищий")
+              
+        elif choice == "2":
+            team_name = input("Введіть назву команди: ")
+            unit_name = input("Введіть назву відділення: ")
+            if self.assign_team_to_unit(team_name, unit_name):
+                print(f"Команду {team_name} включено до {unit_name}")
+            else:
+                print("Команду або відділення не знайдено, або команда вже в підрозділі")
+              
+        elif choice == "3":
+            unit_name = input("Введіть назву підрозділу: ")
+            unit = self.find_unit(unit_name)
+            
+            if unit:
+                print(unit.report())
+            else:
+                print(f"Підрозділ '{unit_name}' не знайдено")
+              
+        elif choice == "4":
+            if not self.units:
+                print("Підрозділів не знайдено")
+            else:
+                print("\n===== УСІ ПІДРОЗДІЛИ =====")
+                for i, unit in enumerate(self.units, 1):
+                    parent = unit.parent.name if unit.parent else "Немає"
+                    print(f"{i}. {unit} - Вищий підрозділ: {parent}, Особовий склад: {unit.rollup()['особовий склад']}")
+              
         input("\nНатисніть Enter, щоб продовжити...")
     
     def run(self):
@@ -1249,12 +5079,205 @@ class MilitarySimulator:
             elif choice == "5":
                 self.reports_menu()
             elif choice == "6":
+                self.support_menu()
+            elif choice == "7":
+                self.unit_menu()
+            elif choice == "8":
+                self.combat_menu()
+            elif choice == "9":
+                if self.archive:
+                    self.archive.collect(self)
+                    self.archive.close()
                 print("Вихід з симулятора...")
                 break
             else:
                 print("Невірний вибір")
 
 
+class ScenarioFork(MilitarySimulator):
+    """Дочірній симулятор для аналізу "що, якщо".
+    
+    Солдати, команди, місії та підрозділи спільні з батьківським симулятором, доки
+    дочірній не змінює їх: усі змінні шляхи, зокрема підсистеми тактів, отримують
+    об'єкт через own(), і тоді створюється приватна копія. Копіювання слідує за
+    вкладеністю в обидва боки: місія -> команди -> члени команд, а копія солдата чи
+    команди тягне за собою команди й місії, що їх містять; підрозділ копіюється з усім деревом.
+    Підсистеми створюються заново, як у батьківському симуляторі, з порожнім станом.
+    """
+    
+    _fork_counter = 0
+    
+    def __init__(self, parent, seed=None, record=False):
+        ScenarioFork._fork_counter += 1
+        self.parent = parent
+        self.soldiers = list(parent.soldiers)
+        self.teams = list(parent.teams)
+        self.missions = list(parent.missions)
+        self.units = list(parent.units)
+        self.owned = {}  # id(батьківського об'єкта) -> приватна копія
+        self.events_log = []
+        self.event_store = EventStore()
+        self.equipment_database = parent.equipment_database
+        
+        # Індекс копіюється поверхнево: групи містять ті самі об'єкти
+        self.status_index = StatusIndex()
+        self.status_index.groups = {status: dict(group) for status, group in parent.status_index.groups.items()}
+        
+        self.message_store = MessageStore()
+        self.message_bus = MessageBus(self.message_store)
+        self.message_bus.register_topic(MessageBus.THEATRE_TOPIC, lambda: self.teams + self.soldiers)
+        for i, team in enumerate(self.teams):
+            self.message_bus.register_topic(MessageBus.team_topic(team.name), lambda i=i: [self.teams[i]] + self.teams[i].members)
+        for i, mission in enumerate(self.missions):
+            self.message_bus.register_topic(
+                MessageBus.mission_topic(mission.name),
+                lambda i=i: [recipient for team in self.missions[i].teams for recipient in [team] + team.members]
+            )
+        
+        if seed is None:
+            seed = parent.rng.derive_seed("форк", ScenarioFork._fork_counter)
+        self.rng = RandomStreams(seed, on_new_stream=self._log_stream_seed)
+        self.current_tick = parent.current_tick
+        self.tick_handlers = []
+        self.replay = None
+        self._create_subsystems()
+        self.replay = ReplayRecorder(self) if record else None
+        self.rng.recorder = self.replay
+        self.archive = None
+        self.log_event("Сценарій відгалужено на такті {}, зерно {}", "загальне", self.current_tick, seed)
+    
+    def own(self, obj):
+        """Повернути приватну копію солдата, команди чи місії, створивши її за потреби"""
+        if obj is None:
+            return None
+        if id(obj) in self.owned:
+            return self.owned[id(obj)]
+        if getattr(obj, "_fork", None) is self:
+            return obj
+        
+        if isinstance(obj, Soldier):
+            return self._own_soldier(obj)
+        if isinstance(obj, Team):
+            return self._own_team(obj)
+        if isinstance(obj, Mission):
+            return self._own_mission(obj)
+        if isinstance(obj, Unit):
+            return self._own_unit(obj)
+        return obj
+    
+    def _replace(self, collection, original, private):
+        for i, item in enumerate(collection):
+            if item is original:
+                collection[i] = private
+                return
+    
+    def _own_soldier(self, soldier):
+        private = copy.copy(soldier)
+        private._fork = self
+        private.on_change = self._entity_changed
+        private.equipment = dict(soldier.equipment)
+        private.skills = dict(soldier.skills)
+        private.history = list(soldier.history)
+        private.message_store = self.message_store
+        private.event_store = self.event_store
+        private.status_indexes = [self.status_index]
+        self.owned[id(soldier)] = private
+        
+        self._replace(self.soldiers, soldier, private)
+        if soldier in self.status_index.groups.get(soldier.status, ()):
+            self.status_index.discard(soldier)
+            self.status_index.add(private)
+        
+        # Команди з цим солдатом копіюються теж, інакше вони бачили б батьківський об'єкт
+        for team in list(self.teams):
+            if any(member is soldier for member in team.members):
+                self.own(team)
+        return private
+    
+    def _own_team(self, team):
+        private = copy.copy(team)
+        private._fork = self
+        private.on_change = self._entity_changed
+        self.owned[id(team)] = private
+        private.members = [self.own(member) for member in team.members]
+        private.commander = self.own(team.commander)
+        private.mission_log = list(team.mission_log)
+        private.event_store = self.event_store
+        private.equipment_inventory = dict(team.equipment_inventory)
+        private.message_store = self.message_store
+        if team.message_bus is not None:
+            private.message_bus = self.message_bus
+        if team.radio_network is not None:
+            private.radio_network = self.radio
+        private.status_index = StatusIndex(Soldier.STATUS_TYPES, on_change=private.invalidate_metrics)
+        private._metrics = None
+        private._rollup = None
+        for member in private.members:
+            member.status_indexes.append(private.status_index)
+            private.status_index.add(member)
+        if team.unit:
+            private.unit = self.own(team.unit)
+            self._replace(private.unit.teams, team, private)
+            private.unit.invalidate()
+        
+        self._replace(self.teams, team, private)
+        for mission in list(self.missions):
+            if any(assigned is team for assigned in mission.teams):
+                self.own(mission)
+        return private
+    
+    def _own_unit(self, unit):
+        # Дерево підрозділів копіюється цілком, щоб зв'язки предок-нащадок лишалися узгодженими
+        root = unit
+        while root.parent is not None:
+            root = root.parent
+        pending = [(root, None)]
+        while pending:
+            original, parent = pending.pop()
+            private = copy.copy(original)
+            private._fork = self
+            private.parent = parent
+            private.children = []
+            private.teams = [self.owned.get(id(team), team) for team in original.teams]
+            private._rollup = None
+            self.owned[id(original)] = private
+            if parent is not None:
+                parent.children.append(private)
+            self._replace(self.units, original, private)
+            pending.extend((child, private) for child in reversed(original.children))
+        return self.owned[id(unit)]
+    
+    def _own_mission(self, mission):
+        private = copy.copy(mission)
+        private._fork = self
+        private.on_change = self._entity_changed
+        self.owned[id(mission)] = private
+        private.teams = [self.own(team) for team in mission.teams]
+        private.objectives = [dict(objective, requires=list(objective["requires"])) for objective in mission.objectives]
+        private.events = list(mission.events)
+        private.event_store = self.event_store
+        private.rewards = dict(mission.rewards)
+        private.ready_objectives = set(mission.ready_objectives)
+        private._ready_heap = list(mission._ready_heap)
+        private._plain_heap = list(mission._plain_heap)
+        private._dependents = [list(dependents) for dependents in mission._dependents]
+        
+        self._replace(self.missions, mission, private)
+        return private
+    
+    def find_soldier(self, name):
+        return self.own(super().find_soldier(name))
+    
+    def find_team(self, name):
+        return self.own(super().find_team(name))
+    
+    def find_mission(self, name):
+        return self.own(super().find_mission(name))
+    
+    def find_unit(self, name):
+        return self.own(super().find_unit(name))
+
+
 # Приклад даних
 def create_sample_data(simulator):
     # Створення солдатів
@@ -1306,14 +5329,14 @@ def create_sample_data(simulator):
     # Створення місій
     recon = simulator.create_mission("Орлине око", "Розвідка ворожої території", (50, 60))
     recon.set_difficulty(3)
-    recon.add_objective("Досягти точки спостереження")
+    recon.add_objective("Досягти точки спостереження", location=(50, 60), radius=10)
     recon.add_objective("Зібрати розвіддані")
     recon.add_objective("Задокументувати рух ворога")
-    recon.add_objective("Повернутися на базу")
+    recon.add_objective("Повернутися на базу", requires=[0, 1, 2], location=(0, 0), radius=10)
     
     assault = simulator.create_mission("Удар молота", "Знищення ворожого опорного пункту", (80, 30))
     assault.set_difficulty(7)
-    assault.add_objective("Забезпечити периметр")
+    assault.add_objective("Забезпечити периметр", location=(80, 30), radius=15, condition="утримання", hold_ticks=3)
     assault.add_objective("Знищити ворожі сили")
     assault.add_objective("Забезпечити об'єкт")
     assault.add_objective("Отримати розвіддані")
@@ -1331,16 +5354,24 @@ def create_sample_data(simulator):
     recon.complete_objective(0)
     recon.log_event("Команда Альфа досягла точки спостереження")
     
+    # Створення складу
+    simulator.logistics.add_depot("Головна база", (0, 0), {"Вода": 200, "Патрони": 300, "Аптечка": 40, "Гвинтівка": 10})
+    
     simulator.log_event("Прикладні дані успішно створено")
     return simulator
 
 
 # Основне виконання
 if __name__ == "__main__":
-    simulator = MilitarySimulator()
+    print("Військовий симулятор")
+    
+    # Зерно дозволяє повністю відтворити прогін симуляції
+    seed_input = input("Введіть зерно симуляції (Enter для випадкового): ").strip()
+    simulator = MilitarySimulator(seed=int(seed_input) if seed_input.isdigit() else None)
+    if input("Архівувати застарілі записи журналів на диск? (y/n): ").lower() == 'y':
+        simulator.enable_archive("archive")
     
     # Запит на завантаження прикладних даних
-    print("Військовий симулятор")
     use_sample = input("Бажаєте завантажити прикладні дані? (y/n): ").lower()
     
     if use_sample == 'y':